@@ -1,7 +1,10 @@
-from config import USER_SHEETS
+from config import ADMIN_IDS, USER_SHEETS
 
 def allowed(update) -> bool:
     if update.message and update.message.text == "/whoami":
         return True
     uid = str(update.effective_user.id) if update.effective_user else ""
     return uid in USER_SHEETS
+
+def is_admin(update) -> bool:
+    return bool(update.effective_user) and str(update.effective_user.id) in ADMIN_IDS
@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime
+
+from catalogs import cached_catalog_table, col_clean, store_catalog_table
+from cierres import cerrar, totales_desde_cierre, ultimo_mes_completo
+from config import LEDGER_MIRROR, SHEET_CATEGORIAS, TZ
+from debt_cache import load_deudas_snapshot
+from finance import (
+    PATRIMONIO_APPLIERS,
+    TAB_COLS,
+    build_total_deudas,
+    copy_maps,
+    patrimonio_result,
+    patrimonio_totales,
+    saldo_rules,
+    table_plan,
+)
+from fx import rates_for
+from metrics import add_rows
+from mirror import appended_rows, generation, read_rows, sync_mirror
+from sheet_utils import build_header_map, compile_plan
+from sheets_service import get_sheet_id
+from snapshot import load_snapshot
+from storage import storage_for
+from write_queue import flush_before_read
+
+_ledgers: dict[str, dict] = {}
+_lock = threading.Lock()
+
+def rebuild_ledger(sheet_id: str, counts: dict[str, int], rules: dict, fx) -> dict:
+    ledger = {"counts": {}, "generations": {}, "plans": {}, "rules": rules, "fx": fx}
+    tablas = {}
+    for tab in PATRIMONIO_APPLIERS:
+        values = read_rows(sheet_id, tab, 1, counts.get(tab, 0))
+        plan = compile_plan(build_header_map(values), TAB_COLS[tab])
+        add_rows(len(values) - 1)
+        tablas[tab] = (values[1:], plan)
+        ledger["plans"][tab] = plan
+        ledger["counts"][tab] = counts.get(tab, 0)
+        ledger["generations"][tab] = generation(sheet_id, tab)
+    ledger["maps"] = totales_desde_cierre(sheet_id, tablas, rules, fx, ledger["generations"])
+    return ledger
+
+def has_drift(ledger, sheet_id: str, counts: dict[str, int], rules: dict, fx) -> bool:
+    if ledger is None or ledger["rules"].cuentas != rules.cuentas or ledger["fx"] is not fx:
+        return True
+    for tab in PATRIMONIO_APPLIERS:
+        applied = ledger["counts"][tab]
+        if ledger["generations"][tab] != generation(sheet_id, tab):
+            return True
+        if counts.get(tab, 0) < applied or (applied == 0 and counts.get(tab, 0) > 0):
+            return True
+    return False
+
+def apply_rows(ledger, tab: str, rows: list):
+    apply_row = PATRIMONIO_APPLIERS[tab]
+    add_rows(len(rows))
+    for row in rows:
+        apply_row(ledger["maps"], row, ledger["plans"][tab], ledger["rules"], ledger["fx"])
+    ledger["counts"][tab] += len(rows)
+
+def totales_actuales(gc, uid: int, fx) -> tuple[dict, dict]:
+    if not LEDGER_MIRROR or not storage_for(uid).remote:
+        snap = load_snapshot(gc, uid, agregado=True)
+        rules = saldo_rules(col_clean(snap.table(SHEET_CATEGORIAS).column(5)))
+        return patrimonio_totales(snap, rules, fx), rules
+
+    flush_before_read(gc, uid)
+
+    catalogo = cached_catalog_table(get_sheet_id(uid))
+    tabs = tuple(PATRIMONIO_APPLIERS) if catalogo is not None else (*PATRIMONIO_APPLIERS, SHEET_CATEGORIAS)
+    sheet_id, counts, fresh = sync_mirror(gc, uid, tabs)
+    if catalogo is None:
+        catalogo = store_catalog_table(sheet_id, fresh[SHEET_CATEGORIAS])["table"]
+    rules = saldo_rules(col_clean(catalogo.column(5)))
+
+    with _lock:
+        ledger = _ledgers.get(sheet_id)
+        if has_drift(ledger, sheet_id, counts, rules, fx):
+            ledger = rebuild_ledger(sheet_id, counts, rules, fx)
+            _ledgers[sheet_id] = ledger
+        else:
+            for tab in PATRIMONIO_APPLIERS:
+                applied = ledger["counts"][tab]
+                if counts[tab] > applied:
+                    apply_rows(ledger, tab, read_rows(sheet_id, tab, applied + 1, counts[tab]))
+        maps = copy_maps(ledger["maps"])
+
+    return maps, rules
+
+def patrimonio_actual(gc, uid: int, cuentas: list[str] = None, deudas: bool = False) -> dict:
+    pasivos_gtq = build_total_deudas(load_deudas_snapshot(gc, uid)) if deudas else 0.0
+    fx = rates_for(gc, uid)
+    maps, rules = totales_actuales(gc, uid, fx)
+    return patrimonio_result(maps, rules, cuentas, pasivos_gtq=pasivos_gtq, fx=fx)
+
+def saldos_actuales(gc, uid: int, cuentas: list[str]) -> dict[str, float]:
+    return patrimonio_actual(gc, uid, cuentas)["saldos"]
+
+def cerrar_meses(gc, uid: int, hasta: str = None) -> dict:
+    snap = load_snapshot(gc, uid, tabs=(*PATRIMONIO_APPLIERS, SHEET_CATEGORIAS))
+    rules = saldo_rules(col_clean(snap.table(SHEET_CATEGORIAS).column(5)))
+    tablas = {tab: table_plan(snap, tab) for tab in PATRIMONIO_APPLIERS}
+    hasta = hasta or ultimo_mes_completo(datetime.now(TZ).date())
+    return cerrar(snap.sheet_id or get_sheet_id(uid), tablas, rules, rates_for(gc, uid), hasta, snap.generations)
+
+def apply_append(sheet_id: str, tab: str, response):
+    appended = appended_rows(response)
+    if tab not in PATRIMONIO_APPLIERS or not appended:
+        return
+
+    first_row, values = appended
+    with _lock:
+        ledger = _ledgers.get(sheet_id)
+        if ledger is None or ledger["generations"][tab] != generation(sheet_id, tab):
+            return
+        if ledger["counts"][tab] == first_row - 1:
+            apply_rows(ledger, tab, values)
@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("USER_SHEETS", "{}")
+os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", "{}")
+
+from sheets_async import run_sheets
+
+def slow_sheets_call(latency: float):
+    time.sleep(latency)
+    return latency
+
+async def handler_blocking(uid: int, latency: float):
+    return slow_sheets_call(latency)
+
+async def handler_offloaded(uid: int, latency: float):
+    return await run_sheets(uid, slow_sheets_call, latency)
+
+async def run(handler, users: int, latency: float) -> float:
+    t0 = time.perf_counter()
+    await asyncio.gather(*(handler(uid, latency) for uid in range(users)))
+    return time.perf_counter() - t0
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+
+    blocking = await run(handler_blocking, users, latency)
+    offloaded = await run(handler_offloaded, users, latency)
+
+    print(f"usuarios={users} latencia_simulada={latency:.2f}s")
+    print(f"en el event loop: {blocking:.2f}s")
+    print(f"con run_sheets:   {offloaded:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
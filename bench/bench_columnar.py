@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("USER_SHEETS", "{}")
+os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", "{}")
+
+import columnar
+import finance
+from snapshot import LedgerSnapshot, make_table
+from synthetic import gen_ledger
+
+def snapshot_for(tabs: dict) -> LedgerSnapshot:
+    return LedgerSnapshot(tables={name: make_table(values) for name, values in tabs.items()})
+
+def run_builders(tabs: dict, engine: bool) -> tuple[dict, float]:
+    finance.COLUMNAR_ENGINE = engine
+    snap = snapshot_for(tabs)
+    t0 = time.perf_counter()
+    out = {
+        "saldos": finance.build_saldos_dinamicos(snap, ["Efectivo", "BI", "Zigi", "GyT"]),
+        "networth": finance.build_networth(snap),
+        "resumen": finance.resumen_periodos(snap, date(2024, 1, 1), date(2024, 7, 1)),
+        "resumen_mes": finance.resumen_periodos(snap, date(2024, 1, 1), date(2024, 7, 1), "mes"),
+        "resumen_dia": finance.resumen_periodos(snap, date(2024, 2, 10), date(2024, 3, 5), "dia"),
+    }
+    return out, time.perf_counter() - t0
+
+def same(a, b, path="") -> list[str]:
+    if isinstance(a, dict) and isinstance(b, dict):
+        if list(a) != list(b):
+            return [f"{path}: claves {list(a)} != {list(b)}"]
+        return [d for k in a for d in same(a[k], b[k], f"{path}.{k}")]
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return [f"{path}: largo {len(a)} != {len(b)}"]
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in same(x, y, f"{path}[{i}]")]
+    if isinstance(a, float) or isinstance(b, float):
+        return [] if abs(a - b) <= 1e-6 * max(1.0, abs(a)) else [f"{path}: {a} != {b}"]
+    return [] if a == b else [f"{path}: {a!r} != {b!r}"]
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"numpy: {'sí' if columnar.np is not None else 'no (array)'}")
+    failures = 0
+    for n in sizes:
+        for seed in (1, 2, 3):
+            tabs = gen_ledger(n, seed=seed)
+            base, t_py = run_builders(tabs, False)
+            cols, t_col = run_builders(tabs, True)
+            diffs = same(base, cols)
+            failures += bool(diffs)
+            status = "OK" if not diffs else "DIFERENTE: " + "; ".join(diffs[:3])
+            print(f"filas={n:>7} seed={seed} python={t_py:7.3f}s columnar={t_col:7.3f}s {status}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
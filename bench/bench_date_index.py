@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("USER_SHEETS", "{}")
+os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", "{}")
+
+from config import SHEET_EGRESOS
+from date_index import date_index, rows_between
+from finance import EGR_COLS
+from helpers import parse_fecha
+from sheet_utils import compile_plan
+from snapshot import LedgerSnapshot, make_table
+from synthetic import gen_ledger
+
+def full_scan(snap, start, end):
+    t = snap.table(SHEET_EGRESOS)
+    fecha = compile_plan(t.hmap, EGR_COLS)["fecha"]
+    out = []
+    for r in t.rows:
+        f = parse_fecha(fecha(r))
+        if f and start <= f < end:
+            out.append((r, f))
+    return out
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tabs = gen_ledger(n)
+    snap = LedgerSnapshot(tables={name: make_table(values) for name, values in tabs.items()})
+    end = date(2026, 10, 12)
+    ranges = [("semana", end - timedelta(days=7)), ("mes", end - timedelta(days=30)), ("año", end - timedelta(days=365))]
+
+    t0 = time.perf_counter()
+    date_index(snap, SHEET_EGRESOS)
+    print(f"filas={n} construir índice={time.perf_counter() - t0:.3f}s")
+
+    for name, start in ranges:
+        t0 = time.perf_counter()
+        scanned = full_scan(snap, start, end)
+        t_scan = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        indexed = rows_between(snap, SHEET_EGRESOS, start, end)
+        t_idx = time.perf_counter() - t0
+        status = "OK" if scanned == indexed else "DIFERENTE"
+        print(f"{name:>6}: recorrido={t_scan:.4f}s índice={t_idx:.6f}s filas={len(indexed)} {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("USER_SHEETS", "{}")
+os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", "{}")
+
+from finance import EGR_COLS
+from helpers import pick
+from sheet_utils import build_header_map, cell, compile_plan
+
+HEADER = ["FECHA", "CATEGORÍA", "MONTO", "MÉTODO", "BANCO", "NOTA"]
+
+def make_rows(n: int) -> list[list[str]]:
+    return [["2026-01-15", "Comida", f"{i % 500}.25", "Transferencia", "BI", ""] for i in range(n)]
+
+def with_pick(rows):
+    records = [dict(zip(HEADER, r)) for r in rows]
+    t0 = time.perf_counter()
+    for r in records:
+        pick(r, "FECHA", "Fecha")
+        pick(r, "MONTO", "Monto")
+        pick(r, "CATEGORÍA", "CATEGORIA", "Categoría", "Categoria")
+        pick(r, "MÉTODO", "METODO", "Metodo")
+        pick(r, "BANCO", "Banco")
+    return time.perf_counter() - t0
+
+def with_cell(rows):
+    hmap = build_header_map([HEADER])
+    t0 = time.perf_counter()
+    for r in rows:
+        cell(r, hmap, "FECHA", "Fecha")
+        cell(r, hmap, "MONTO", "Monto")
+        cell(r, hmap, "CATEGORÍA", "CATEGORIA", "Categoría", "Categoria")
+        cell(r, hmap, "MÉTODO", "METODO", "Metodo")
+        cell(r, hmap, "BANCO", "Banco")
+    return time.perf_counter() - t0
+
+def with_plan(rows):
+    t0 = time.perf_counter()
+    plan = compile_plan(build_header_map([HEADER]), EGR_COLS)
+    fecha, monto, categoria, metodo, banco = (plan[k] for k in ("fecha", "monto", "categoria", "metodo", "banco"))
+    for r in rows:
+        fecha(r)
+        monto(r)
+        categoria(r)
+        metodo(r)
+        banco(r)
+    return time.perf_counter() - t0
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = make_rows(n)
+    for name, fn in (("pick()", with_pick), ("cell()", with_cell), ("plan", with_plan)):
+        elapsed = fn(rows)
+        print(f"{name:8} {elapsed:8.3f}s  {elapsed / n * 1e6:8.2f} us/fila")
+
+if __name__ == "__main__":
+    main()
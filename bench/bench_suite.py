@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ["USER_SHEETS"] = "{}"
+os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", "{}")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-"))
+os.environ.setdefault("LEDGER_MIRROR", "0")
+os.environ.setdefault("SHEETS_READS_PER_MINUTE", "1000000")
+os.environ.setdefault("SHEETS_WRITES_PER_MINUTE", "1000000")
+
+import columnar
+from catalogs import load_catalogos
+from config import COLUMNAR_ENGINE, CUENTAS, LEDGER_MIRROR, SHEET_EGRESOS, SHEET_INGRESOS, USER_SHEETS
+from debt_cache import load_deudas_snapshot
+from fake_gspread import FakeClient
+from finance import (
+    build_deudas,
+    build_networth,
+    build_patrimonio,
+    build_resumen_mes,
+    build_resumen_semana,
+    build_saldos_dinamicos,
+)
+from sheets_service import get_sheet_for_user
+from snapshot import load_snapshot
+from synthetic import gen_ledger
+
+RESUMEN_TABS = (SHEET_INGRESOS, SHEET_EGRESOS)
+
+def casos(gc, uid: int) -> dict:
+    return {
+        "build_saldos_dinamicos": (lambda: load_snapshot(gc, uid), lambda snap: build_saldos_dinamicos(snap, CUENTAS)),
+        "build_networth": (lambda: load_snapshot(gc, uid), build_networth),
+        "build_patrimonio": (lambda: load_snapshot(gc, uid), lambda snap: build_patrimonio(snap, CUENTAS)),
+        "build_resumen_mes": (lambda: load_snapshot(gc, uid, tabs=RESUMEN_TABS), build_resumen_mes),
+        "build_resumen_semana": (lambda: load_snapshot(gc, uid, tabs=RESUMEN_TABS), build_resumen_semana),
+        "build_deudas": (lambda: load_deudas_snapshot(gc, uid), build_deudas),
+        "load_catalogos": (lambda: get_sheet_for_user(gc, uid), lambda sh: load_catalogos(sh, force=True)),
+    }
+
+def medir(gc, leer, calcular) -> dict:
+    antes = Counter(gc.calls)
+    t0 = time.perf_counter()
+    datos = leer()
+    t1 = time.perf_counter()
+    calcular(datos)
+    t2 = time.perf_counter()
+    llamadas = gc.calls - antes
+    return {"lectura_s": t1 - t0, "calculo_s": t2 - t1, "total_s": t2 - t0, "llamadas": dict(sorted(llamadas.items()))}
+
+def resumir(corridas: list[dict]) -> dict:
+    totales = [c["total_s"] for c in corridas]
+    return {
+        "total_min_s": min(totales),
+        "total_mediana_s": statistics.median(totales),
+        "lectura_mediana_s": statistics.median(c["lectura_s"] for c in corridas),
+        "calculo_mediana_s": statistics.median(c["calculo_s"] for c in corridas),
+        "llamadas": corridas[-1]["llamadas"],
+    }
+
+def correr_tamano(n: int, seed: int, repeticiones: int, latencia: float) -> dict:
+    gc = FakeClient(latencia)
+    key = f"bench-{n}-{seed}"
+    gc.add_spreadsheet(key, gen_ledger(n, seed=seed))
+    uid = n * 100 + seed
+    USER_SHEETS[str(uid)] = key
+
+    out = {}
+    for nombre, (leer, calcular) in casos(gc, uid).items():
+        frio = medir(gc, leer, calcular)
+        caliente = resumir([medir(gc, leer, calcular) for _ in range(repeticiones)])
+        out[nombre] = {"frio": frio, "caliente": caliente}
+        print(
+            f"filas={n:>7} {nombre:<24} frío={frio['total_s'] * 1000:9.1f}ms llamadas={sum(frio['llamadas'].values()):>2}"
+            f" | caliente={caliente['total_mediana_s'] * 1000:9.1f}ms llamadas={sum(caliente['llamadas'].values()):>2}"
+        )
+    return out
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+def comparar(base: dict, actual: dict, tolerancia: float) -> list[str]:
+    regresiones = []
+    for n, benches in actual["resultados"].items():
+        for nombre, r in benches.items():
+            b = base.get("resultados", {}).get(n, {}).get(nombre)
+            if not b:
+                continue
+            for fase in ("frio", "caliente"):
+                llamadas_b = sum(b[fase]["llamadas"].values())
+                llamadas_a = sum(r[fase]["llamadas"].values())
+                if llamadas_a > llamadas_b:
+                    regresiones.append(f"filas={n} {nombre} {fase}: llamadas {llamadas_b} -> {llamadas_a}")
+            t_b = b["caliente"]["total_mediana_s"]
+            t_a = r["caliente"]["total_mediana_s"]
+            ratio = t_a / t_b if t_b else 1.0
+            print(f"filas={n:>7} {nombre:<24} {t_b * 1000:9.1f}ms -> {t_a * 1000:9.1f}ms (x{ratio:.2f})")
+            if ratio > 1 + tolerancia:
+                regresiones.append(f"filas={n} {nombre}: {t_b * 1000:.1f}ms -> {t_a * 1000:.1f}ms")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de finance.py sobre un Sheet simulado en memoria")
+    parser.add_argument("filas", nargs="*", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos simulados por llamada a la API")
+    parser.add_argument("--salida", default="", help="archivo JSON con los resultados")
+    parser.add_argument("--comparar", default="", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    resultados = {}
+    for n in args.filas:
+        resultados[str(n)] = correr_tamano(n, args.seed, args.repeticiones, args.latencia)
+
+    actual = {
+        "commit": git_commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": columnar.np is not None,
+        "motor": "columnar" if COLUMNAR_ENGINE else "python",
+        "copia_local": LEDGER_MIRROR,
+        "seed": args.seed,
+        "repeticiones": args.repeticiones,
+        "latencia_s": args.latencia,
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(actual, f, ensure_ascii=False, indent=2)
+        print(f"Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"\nComparación contra {base.get('commit') or args.comparar}")
+        regresiones = comparar(base, actual, args.tolerancia)
+        for r in regresiones:
+            print(f"REGRESIÓN {r}")
+        sys.exit(1 if regresiones else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import re
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from gspread.exceptions import WorksheetNotFound
+
+A1 = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+SHEETS_EPOCH = date(1899, 12, 30)
+
+def col_number(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+def col_letters(n: int) -> str:
+    out = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        out = chr(65 + r) + out
+    return out
+
+def parse_a1(a1: str) -> tuple[int, int, int | None, int | None]:
+    m = A1.match(a1.replace("$", ""))
+    if not m:
+        raise ValueError(f"Rango no soportado: {a1}")
+    c1, r1, c2, r2 = m.groups()
+    return int(r1 or 1), col_number(c1 or "A"), int(r2) if r2 else None, col_number(c2) if c2 else None
+
+def cell_text(v) -> str:
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return "" if v is None else str(v)
+
+def user_value(v):
+    entered = v.get("userEnteredValue")
+    if not entered:
+        return ""
+    x = next(iter(entered.values()))
+    if v.get("userEnteredFormat", {}).get("numberFormat", {}).get("type") == "DATE":
+        return (SHEETS_EPOCH + timedelta(days=x)).isoformat()
+    return x
+
+class Cell:
+    def __init__(self, row: int, col: int, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title: str, rows: list[list], sheet_id: int):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.title = title
+        self.id = sheet_id
+        self.rows = [list(r) for r in rows]
+
+    def read_range(self, a1: str) -> list[list[str]]:
+        r1, c1, r2, c2 = parse_a1(a1)
+        out = []
+        for row in self.rows[r1 - 1:r2 if r2 else len(self.rows)]:
+            cut = [cell_text(x) for x in row[c1 - 1:c2]]
+            while cut and cut[-1] == "":
+                cut.pop()
+            out.append(cut)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def get(self, range_name: str = "A1:ZZ", **kwargs):
+        self.client.call("get")
+        return self.read_range(range_name)
+
+    def get_all_values(self, **kwargs):
+        self.client.call("get_all_values")
+        return self.read_range("A1:ZZ")
+
+    def get_all_records(self, **kwargs):
+        self.client.call("get_all_records")
+        values = self.read_range("A1:ZZ")
+        if not values:
+            return []
+        header = values[0]
+        return [dict(zip(header, r + [""] * (len(header) - len(r)))) for r in values[1:]]
+
+    def col_values(self, col: int, **kwargs):
+        self.client.call("col_values")
+        out = [cell_text(r[col - 1]) if col - 1 < len(r) else "" for r in self.rows]
+        while out and out[-1] == "":
+            out.pop()
+        return out
+
+    def cell(self, row: int, col: int, **kwargs) -> Cell:
+        self.client.call("cell")
+        values = self.rows[row - 1] if row - 1 < len(self.rows) else []
+        return Cell(row, col, cell_text(values[col - 1]) if col - 1 < len(values) else "")
+
+    def set_cell(self, row: int, col: int, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        values = self.rows[row - 1]
+        while len(values) < col:
+            values.append("")
+        values[col - 1] = value
+
+    def update_cell(self, row: int, col: int, value):
+        self.client.call("update_cell")
+        self.set_cell(row, col, value)
+        return {"updatedCells": 1}
+
+    def appended(self, n: int, include_values: bool) -> dict:
+        first = len(self.rows) - n + 1
+        width = max((len(r) for r in self.rows[first - 1:]), default=1)
+        updates = {"updatedRange": f"'{self.title}'!A{first}:{col_letters(max(width, 1))}{len(self.rows)}"}
+        if include_values:
+            updates["updatedData"] = {"values": [[cell_text(v) for v in r] for r in self.rows[first - 1:]]}
+        return {"updates": updates}
+
+    def append_row(self, values: list, include_values_in_response: bool = False, **kwargs):
+        self.client.call("append_row")
+        self.rows.append(list(values))
+        return self.appended(1, include_values_in_response)
+
+    def append_rows(self, values: list[list], include_values_in_response: bool = False, **kwargs):
+        self.client.call("append_rows")
+        self.rows.extend(list(r) for r in values)
+        return self.appended(len(values), include_values_in_response)
+
+class FakeSpreadsheet:
+    def __init__(self, client, key: str, tabs: dict[str, list[list]]):
+        self.client = client
+        self.id = key
+        self.tabs = {name: FakeWorksheet(self, name, rows, i) for i, (name, rows) in enumerate(tabs.items())}
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.client.call("worksheet")
+        if title not in self.tabs:
+            raise WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        self.client.call("worksheets")
+        return list(self.tabs.values())
+
+    def values_batch_get(self, ranges: list[str], params=None) -> dict:
+        self.client.call("values_batch_get")
+        out = []
+        for r in ranges:
+            tab, a1 = r.rsplit("!", 1)
+            out.append({"range": r, "values": self.tabs[tab.strip("'")].read_range(a1)})
+        return {"spreadsheetId": self.id, "valueRanges": out}
+
+    def batch_update(self, body: dict) -> dict:
+        self.client.call("batch_update")
+        by_id = {ws.id: ws for ws in self.tabs.values()}
+        for req in body.get("requests", []):
+            if "appendCells" in req:
+                ws = by_id[req["appendCells"]["sheetId"]]
+                for rd in req["appendCells"]["rows"]:
+                    ws.rows.append([user_value(v) for v in rd["values"]])
+            elif "updateCells" in req:
+                uc = req["updateCells"]
+                ws = by_id[uc["start"]["sheetId"]]
+                for i, rd in enumerate(uc["rows"]):
+                    for j, v in enumerate(rd["values"]):
+                        ws.set_cell(uc["start"]["rowIndex"] + i + 1, uc["start"]["columnIndex"] + j + 1, user_value(v))
+        return {"spreadsheetId": self.id, "replies": []}
+
+class FakeClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.sheets: dict[str, FakeSpreadsheet] = {}
+
+    def call(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_spreadsheet(self, key: str, tabs: dict[str, list[list]]) -> FakeSpreadsheet:
+        self.sheets[key] = FakeSpreadsheet(self, key, tabs)
+        return self.sheets[key]
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.call("open_by_key")
+        return self.sheets[key]
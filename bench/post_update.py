@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+import time
+import urllib.request
+
+def post(url: str, payload: bytes, secret: str | None) -> tuple[int, float]:
+    req = urllib.request.Request(url, data=payload, method="POST", headers={"Content-Type": "application/json"})
+    if secret:
+        req.add_header("X-Telegram-Bot-Api-Secret-Token", secret)
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req) as res:
+        return res.status, time.perf_counter() - t0
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python bench/post_update.py update.json [url]")
+        sys.exit(2)
+
+    port = os.environ.get("WEBHOOK_PORT", os.environ.get("PORT", "8443"))
+    path = os.environ.get("WEBHOOK_PATH", "telegram").strip("/")
+    url = sys.argv[2] if len(sys.argv) > 2 else f"http://127.0.0.1:{port}/{path}"
+    secret = os.environ.get("WEBHOOK_SECRET")
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        data = json.load(f)
+    updates = data if isinstance(data, list) else [data]
+
+    for update in updates:
+        status, secs = post(url, json.dumps(update).encode("utf-8"), secret)
+        print(f"update_id={update.get('update_id')} status={status} {secs * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import random
+from datetime import date, timedelta
+
+CUENTAS = ["Efectivo", "BI", "Banrural", "Nexa", "Zigi", "Ahorro", "Préstamos", "Binance", "Hapi"]
+CATEG_ING = ["Salario", "Proyecto", "Inversiones", "Prestamos", "Otros"]
+CATEG_EGR = ["Comida", "Casa", "Transporte", "Salud", "Supermercado", "Suscripciones", "Deuda", "Otros"]
+BANCOS = ["BI", "Banrural", "Nexa", "Zigi"]
+PERSONAS = ["Juan", "Ana", "Luis"]
+
+HEADERS = {
+    "Ingresos": ["FECHA", "FUENTE", "CATEGORÍA", "MONTO", "MÉTODO", "BANCO", "NOTA"],
+    "Egresos": ["FECHA", "CATEGORÍA", "MONTO", "MÉTODO", "BANCO", "NOTA"],
+    "Movimientos": [
+        "FECHA", "BOLSA_REMITENTE", "REMITENTE", "BOLSA_DESTINO", "DESTINO",
+        "PERSONA_PRESTAMO", "MONTO", "MONTO_DESTINO", "NOTA",
+    ],
+    "Deudas": [
+        "NOMBRE", "A QUIÉN LE DEBO", "FECHA DE PAGO", "CUOTA", "MESES",
+        "PAGADOS", "PENDIENTES", "SALDO", "ESTADO",
+    ],
+}
+
+def categorias_tab() -> list[list[str]]:
+    cols = [
+        ["Trabajo", "Freelance", "Otros"],
+        CATEG_ING,
+        ["Efectivo", "Transferencia", "Binance", "Hapi"],
+        BANCOS,
+        CATEG_EGR,
+        CUENTAS,
+        PERSONAS,
+    ]
+    out = [["FUENTES", "CATEG_ING", "METODOS", "BANCOS", "CATEG_EGR", "CUENTAS", "PERSONAS"]]
+    for i in range(max(len(c) for c in cols)):
+        out.append([c[i] if i < len(c) else "" for c in cols])
+    return out
+
+def fecha_txt(rnd, d: date) -> str:
+    return d.strftime("%Y-%m-%d") if rnd.random() < 0.9 else d.strftime("%d/%m/%Y")
+
+def gen_ledger(n_rows: int, seed: int = 1, start: date = date(2020, 1, 1), end: date = date(2026, 10, 17)) -> dict[str, list[list[str]]]:
+    rnd = random.Random(seed)
+    span = (end - start).days
+    fechas = sorted(start + timedelta(days=rnd.randrange(span + 1)) for _ in range(n_rows))
+
+    tabs = {name: [list(h)] for name, h in HEADERS.items()}
+    for d in fechas:
+        f = fecha_txt(rnd, d)
+        k = rnd.random()
+        if k < 0.3:
+            categoria = rnd.choice(CATEG_ING)
+            if categoria == "Inversiones":
+                metodo = rnd.choice(["Binance", "Hapi"])
+            else:
+                metodo = rnd.choice(["Efectivo", "Transferencia"])
+            banco = rnd.choice(BANCOS + ["nexa "]) if metodo == "Transferencia" else ""
+            tabs["Ingresos"].append([f, "Trabajo", categoria, f"{rnd.uniform(10, 5000):.2f}", metodo, banco, ""])
+        elif k < 0.8:
+            metodo = rnd.choice(["Efectivo", "Transferencia"])
+            banco = rnd.choice(BANCOS) if metodo == "Transferencia" else ""
+            tabs["Egresos"].append([f, rnd.choice(CATEG_EGR), f"{rnd.uniform(1, 800):.2f}", metodo, banco, ""])
+        else:
+            bolsa_rem, bolsa_des = rnd.choice([
+                ("Normal", "Normal"), ("Normal", "Ahorro"), ("Ahorro", "Normal"),
+                ("Normal", "Inversion"), ("Inversion", "Normal"),
+                ("Normal", "Prestamos"), ("Prestamos", "Normal"), ("", ""),
+            ])
+            rem = rnd.choice(["Binance", "Hapi"]) if bolsa_rem == "Inversion" else rnd.choice(BANCOS + ["efectivo"])
+            des = rnd.choice(["Binance", "Hapi"]) if bolsa_des == "Inversion" else rnd.choice(BANCOS + ["Efectivo"])
+            persona = rnd.choice(PERSONAS) if "Prestamos" in (bolsa_rem, bolsa_des) else ""
+            monto_destino = f"{rnd.uniform(1, 100):.2f}" if "Inversion" in (bolsa_rem, bolsa_des) else "0"
+            tabs["Movimientos"].append([
+                f, bolsa_rem, rem, bolsa_des, des, persona, f"{rnd.uniform(10, 900):.2f}", monto_destino, "",
+            ])
+
+    for i in range(max(3, n_rows // 2000)):
+        meses = rnd.randint(3, 36)
+        pagados = rnd.randint(0, meses)
+        cuota = rnd.randint(100, 3000)
+        tabs["Deudas"].append([
+            f"Deuda {i + 1}", rnd.choice(PERSONAS + ["Banco"]), fecha_txt(rnd, end + timedelta(days=rnd.randint(1, 30))),
+            str(cuota), str(meses), str(pagados), str(meses - pagados), str(cuota * (meses - pagados)),
+            "Pagada" if pagados == meses else "Activa",
+        ])
+
+    tabs["Categorías"] = categorias_tab()
+    return tabs
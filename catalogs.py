@@ -1,4 +1,8 @@
-from config import CUENTAS, INV_CUENTAS_DEFAULT
+import threading
+import time
+from functools import lru_cache
+
+from config import CATALOG_TTL, CUENTAS, INV_CUENTAS_DEFAULT
 
 from helpers import norm_key
 
@@ -47,17 +51,11 @@ def sort_special(items: list[str], first: str | None = None, last: str | None =
         out.append(last_item)
     return out
 
-def load_catalogos(sh):
-    from config import SHEET_CATEGORIAS
-    ws = sh.worksheet(SHEET_CATEGORIAS)
+_catalog_cache: dict[str, dict] = {}
+_catalog_lock = threading.Lock()
 
-    fuentes_ing = col_clean(ws.col_values(1))
-    categ_ing = col_clean(ws.col_values(2))
-    metodos = col_clean(ws.col_values(3))
-    bancos = col_clean(ws.col_values(4))
-    categ_egr = col_clean(ws.col_values(5))
-    cuentas = col_clean(ws.col_values(6))
-    personas = col_clean(ws.col_values(7))
+def catalogos_from_table(table) -> dict:
+    fuentes_ing, categ_ing, metodos, bancos, categ_egr, cuentas, personas = [col_clean(table.column(i)) for i in range(7)]
 
     return {
         "FUENTES_ING": sort_special(fuentes_ing, last="Otros"),
@@ -69,27 +67,117 @@ def load_catalogos(sh):
         "PERSONAS_PRESTAMO": sort_special(personas, last="Otros"),
     }
 
+def restore_catalog_table(sheet_id: str):
+    from persistence import load_catalog_values
+    from snapshot import make_table
+
+    stored = load_catalog_values(sheet_id)
+    if stored is None:
+        return None
+    values, saved_at = stored
+    entry = store_catalog_table(sheet_id, make_table(values), persist=False)
+    entry["at"] = time.monotonic() - max(time.time() - saved_at, 0)
+    return entry
+
+def cached_catalog_table(sheet_id: str):
+    entry = _catalog_cache.get(sheet_id) or restore_catalog_table(sheet_id)
+    if entry is None or time.monotonic() - entry["at"] > CATALOG_TTL:
+        return None
+    return entry["table"]
+
+def cached_catalogos(sheet_id: str):
+    if cached_catalog_table(sheet_id) is None:
+        return None
+    return _catalog_cache[sheet_id]["catalogos"]
+
+def store_catalog_table(sheet_id: str, table, persist: bool = True) -> dict:
+    from persistence import save_catalog_values
+
+    with _catalog_lock:
+        entry = _catalog_cache.get(sheet_id)
+        changed = entry is None or entry["table"].values != table.values
+        if not changed:
+            entry["at"] = time.monotonic()
+        else:
+            entry = {
+                "table": table,
+                "catalogos": catalogos_from_table(table),
+                "version": (entry["version"] + 1) if entry else 1,
+                "at": time.monotonic(),
+            }
+            _catalog_cache[sheet_id] = entry
+    if persist and changed:
+        save_catalog_values(sheet_id, table.values)
+    return entry
+
+def catalog_version(sheet_id: str) -> int:
+    entry = _catalog_cache.get(sheet_id)
+    return entry["version"] if entry else 0
+
+def load_catalogos(sh, force: bool = False):
+    from config import SHEET_CATEGORIAS
+    from quota import sheets_read
+    from sheets_service import get_worksheet, invalidate_on_error
+    from snapshot import LEDGER_RANGES, make_table
+
+    cats = None if force else cached_catalogos(sh.id)
+    if cats is not None:
+        return cats
+
+    with invalidate_on_error(sh.id):
+        values = sheets_read(get_worksheet(sh, SHEET_CATEGORIAS).get, LEDGER_RANGES[SHEET_CATEGORIAS])
+    return store_catalog_table(sh.id, make_table([list(r) for r in values]))["catalogos"]
+
 def get_catalogos(context):
     cats = context.user_data.get("catalogos")
     if isinstance(cats, dict) and cats:
         return cats
     return None
 
+class AccountIndex:
+    def __init__(self, cuentas, inv_cuentas=None, ahorro_cuenta: str = "Ahorro", prestamos_cuenta: str = "Préstamos"):
+        if inv_cuentas is None:
+            inv_cuentas = INV_CUENTAS_DEFAULT
+
+        self.cuentas = [c for c in cuentas if (c or "").strip()]
+        self.canon_map = {norm_key(c): c for c in self.cuentas}
+        self.inv_keys = frozenset(norm_key(x) for x in inv_cuentas)
+        self.ahorro_key = norm_key(ahorro_cuenta)
+        self.prestamos_key = norm_key(prestamos_cuenta)
+        self.patrimonial_keys = frozenset({self.ahorro_key, self.prestamos_key})
+        self.excluded_keys = self.inv_keys | self.patrimonial_keys
+
+        self.investment = [c for c in self.cuentas if norm_key(c) in self.inv_keys]
+        self.patrimonial = [c for c in self.cuentas if norm_key(c) in self.patrimonial_keys]
+        self.liquid = [c for c in self.cuentas if norm_key(c) not in self.excluded_keys]
+
+    def canon(self, raw: str) -> str:
+        r = (raw or "").strip()
+        if not r:
+            return ""
+        return self.canon_map.get(norm_key(r), r)
+
+    def is_excluded(self, acc: str) -> bool:
+        return norm_key(acc) in self.excluded_keys
+
+    def is_investment(self, acc: str) -> bool:
+        return norm_key(acc) in self.inv_keys
+
+@lru_cache(maxsize=128)
+def _account_index(cuentas: tuple, inv_cuentas: frozenset, ahorro_cuenta: str, prestamos_cuenta: str) -> AccountIndex:
+    return AccountIndex(cuentas, inv_cuentas, ahorro_cuenta, prestamos_cuenta)
+
+def account_index(cuentas, inv_cuentas=None, ahorro_cuenta: str = "Ahorro", prestamos_cuenta: str = "Préstamos") -> AccountIndex:
+    inv = frozenset(INV_CUENTAS_DEFAULT if inv_cuentas is None else inv_cuentas)
+    return _account_index(tuple(cuentas or ()), inv, ahorro_cuenta, prestamos_cuenta)
+
 def canon_cuenta(raw: str, cuentas_catalogo: list[str]) -> str:
-    r = (raw or "").strip()
-    if not r:
-        return ""
-    mapa = {norm_key(c): c for c in (cuentas_catalogo or []) if (c or "").strip()}
-    return mapa.get(norm_key(r), r)
+    return account_index(cuentas_catalogo).canon(raw)
 
 def get_accounts_by_role(context):
     cats = get_catalogos(context) or {}
-    cuentas = cats.get("CUENTAS", CUENTAS)
-    inv_accounts = [c for c in cuentas if norm_key(c) in {norm_key(x) for x in INV_CUENTAS_DEFAULT}]
-    patrimonial_accounts = [c for c in cuentas if norm_key(c) in {"ahorro", "prestamos"}]
-    liquid_accounts = [c for c in cuentas if c not in inv_accounts and c not in patrimonial_accounts]
-    return liquid_accounts, patrimonial_accounts, inv_accounts
+    idx = account_index(cats.get("CUENTAS", CUENTAS))
+    return idx.liquid, idx.patrimonial, idx.investment
 
 def get_investment_accounts_from_catalog(cuentas_catalogo: list[str]) -> list[str]:
-    invset = {norm_key(x) for x in INV_CUENTAS_DEFAULT}
-    return [c for c in cuentas_catalogo if norm_key(c) in invset]
+    return account_index(cuentas_catalogo).investment
@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+
+from config import CIERRES
+from finance import PATRIMONIO_APPLIERS, copy_maps, patrimonio_maps
+from helpers import month_range, parse_fecha
+from metrics import add_rows
+from persistence import load_cierres, pack, save_cierres, unpack
+
+logger = logging.getLogger(__name__)
+
+_cierres: dict[str, list[dict]] = {}
+_verificados: dict[str, dict] = {}
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(sheet_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(sheet_id, threading.Lock())
+
+def mes_de(f: date) -> str:
+    return f"{f.year:04d}-{f.month:02d}"
+
+def mes_siguiente(mes: str) -> str:
+    y, m = map(int, mes.split("-"))
+    return mes_de(month_range(date(y, m, 1))[1])
+
+def ultimo_mes_completo(hoy: date) -> str:
+    return mes_de(hoy.replace(day=1) - timedelta(days=1))
+
+def firma(*partes) -> str:
+    return format(zlib.crc32(json.dumps(partes, ensure_ascii=False, default=str).encode("utf-8")), "08x")
+
+def firma_reglas(idx) -> str:
+    return firma(idx.cuentas, sorted(idx.inv_keys), idx.ahorro_key, idx.prestamos_key)
+
+def fin_de_mes(mes: str) -> int:
+    y, m = map(int, mes_siguiente(mes).split("-"))
+    return date(y, m, 1).toordinal() - 1
+
+def firma_tasas(fx, mes: str) -> str:
+    return fx.firma_hasta(fin_de_mes(mes))
+
+def agrupar(tablas: dict) -> tuple[dict, dict, dict]:
+    meses = defaultdict(dict)
+    sin_fecha = defaultdict(list)
+    huellas = defaultdict(int)
+    for tab, (rows, plan) in tablas.items():
+        fecha = plan["fecha"]
+        vistos = {}
+        for pos, row in enumerate(rows):
+            raw = fecha(row)
+            if raw not in vistos:
+                f = parse_fecha(raw)
+                vistos[raw] = mes_de(f) if f else None
+            mes = vistos[raw]
+            if mes is None:
+                sin_fecha[tab].append(pos)
+                continue
+            meses[mes].setdefault(tab, []).append(pos)
+            huellas[mes] = zlib.crc32("\x1f".join([tab, *map(str, row)]).encode("utf-8"), huellas[mes])
+    return meses, sin_fecha, huellas
+
+def filas(tablas: dict, posiciones: dict) -> dict:
+    return {tab: [tablas[tab][0][p] for p in posiciones[tab]] for tab in tablas if tab in posiciones}
+
+def pendientes_de(tablas: dict, meses: dict, sin_fecha: dict, ultimo) -> dict:
+    pendientes = defaultdict(list)
+    for m in sorted(meses):
+        if ultimo is None or m > ultimo:
+            for tab, rows in filas(tablas, meses[m]).items():
+                pendientes[tab].extend(rows)
+    for tab, rows in filas(tablas, sin_fecha).items():
+        pendientes[tab].extend(rows)
+    return pendientes
+
+def verificado(entry: dict, tablas: dict, generaciones: dict) -> bool:
+    for tab, (rows, plan) in tablas.items():
+        t = entry["tabs"].get(tab)
+        if t is None or len(rows) < t["n"]:
+            return False
+        gen = generaciones.get(tab)
+        if (gen is None or gen != t["gen"]) and rows[:t["n"]] != t["rows"][:t["n"]]:
+            return False
+
+        fecha = plan["fecha"]
+        for pos in range(t["n"], len(rows)):
+            f = parse_fecha(fecha(rows[pos]))
+            if f is None:
+                entry["sin_fecha"].setdefault(tab, []).append(pos)
+            elif mes_de(f) <= entry["ultimo"]:
+                return False
+            else:
+                entry["meses"].setdefault(mes_de(f), {}).setdefault(tab, []).append(pos)
+        t.update(n=len(rows), gen=gen, rows=rows)
+    return True
+
+def cierres_de(sheet_id: str) -> list[dict]:
+    if sheet_id not in _cierres:
+        _cierres[sheet_id] = load_cierres(sheet_id)
+    return _cierres[sheet_id]
+
+def vigentes(guardados: list[dict], huellas: dict, reglas: str, fx) -> int:
+    if not guardados or (huellas and min(huellas) < guardados[0]["mes"]):
+        return 0
+    n = 0
+    for c in guardados:
+        if c["reglas"] != reglas or (fx is not None and c["tasas"] != firma_tasas(fx, c["mes"])):
+            break
+        if c["huella"] != huellas.get(c["mes"], 0):
+            break
+        n += 1
+    return n
+
+def aplicar(maps: dict, tablas: dict, filas: dict, idx, fx):
+    for tab, rows in filas.items():
+        apply_row = PATRIMONIO_APPLIERS[tab]
+        plan = tablas[tab][1]
+        add_rows(len(rows))
+        for row in rows:
+            apply_row(maps, row, plan, idx, fx)
+
+def cerrar(sheet_id: str, tablas: dict, idx, fx=None, hasta: str = None, generaciones: dict = None) -> dict:
+    with _lock_for(sheet_id):
+        guardados = cierres_de(sheet_id)
+        if not CIERRES or (not guardados and hasta is None):
+            pendientes = {tab: rows for tab, (rows, _) in tablas.items()}
+            return {"maps": patrimonio_maps(), "pendientes": pendientes, "mes": None, "nuevos": 0, "recalculados": 0}
+
+        reglas = firma_reglas(idx)
+        objetivo = ""
+        if fx is not None:
+            objetivo = max(hasta or "", guardados[-1]["mes"] if guardados else "")
+
+        entry = _verificados.pop(sheet_id, None)
+        if (
+            entry is not None
+            and entry["guardados"] is guardados
+            and objetivo <= entry["ultimo"]
+            and verificado(entry, tablas, generaciones or {})
+            and vigentes(guardados, entry["huellas"], reglas, fx) == len(guardados)
+        ):
+            _verificados[sheet_id] = entry
+            pendientes = pendientes_de(tablas, entry["meses"], entry["sin_fecha"], None)
+            return {"maps": copy_maps(entry["maps"]), "pendientes": pendientes, "mes": entry["ultimo"], "nuevos": 0, "recalculados": 0}
+
+        meses, sin_fecha, huellas = agrupar(tablas)
+        n = vigentes(guardados, huellas, reglas, fx)
+        recalculados = len(guardados) - n if fx is not None else 0
+
+        if n:
+            maps = copy_maps(unpack(guardados[n - 1]["saldos"]))
+            mes = mes_siguiente(guardados[n - 1]["mes"])
+        else:
+            maps = patrimonio_maps()
+            mes = min(huellas) if huellas else None
+
+        nuevos = []
+        while mes is not None and mes <= objetivo:
+            aplicar(maps, tablas, filas(tablas, meses.get(mes, {})), idx, fx)
+            nuevos.append({"mes": mes, "huella": huellas.get(mes, 0), "reglas": reglas, "tasas": firma_tasas(fx, mes), "saldos": pack(maps)})
+            mes = mes_siguiente(mes)
+
+        if nuevos or recalculados:
+            desde = guardados[n]["mes"] if recalculados else None
+            if desde is not None:
+                logger.info("cierres %s: recalculando desde %s", sheet_id, desde)
+            save_cierres(sheet_id, desde, nuevos)
+            guardados = _cierres[sheet_id] = guardados[:n] + nuevos
+            n = len(guardados)
+
+        ultimo = guardados[n - 1]["mes"] if n else None
+        if n and n == len(guardados):
+            _verificados[sheet_id] = {
+                "guardados": guardados,
+                "ultimo": ultimo,
+                "maps": copy_maps(maps),
+                "huellas": dict(huellas),
+                "meses": {m: {tab: list(ps) for tab, ps in por_tab.items()} for m, por_tab in meses.items() if m > ultimo},
+                "sin_fecha": {tab: list(ps) for tab, ps in sin_fecha.items()},
+                "tabs": {
+                    tab: {"n": len(rows), "gen": (generaciones or {}).get(tab), "rows": rows}
+                    for tab, (rows, _) in tablas.items()
+                },
+            }
+
+    pendientes = pendientes_de(tablas, meses, sin_fecha, ultimo)
+    return {"maps": maps, "pendientes": pendientes, "mes": ultimo, "nuevos": len(nuevos), "recalculados": recalculados}
+
+def totales_desde_cierre(sheet_id: str, tablas: dict, idx, fx, generaciones: dict = None) -> dict:
+    out = cerrar(sheet_id, tablas, idx, fx, generaciones=generaciones)
+    aplicar(out["maps"], tablas, out["pendientes"], idx, fx)
+    return out["maps"]
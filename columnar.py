@@ -0,0 +1,243 @@
+from array import array
+from collections import defaultdict
+
+from catalogs import AccountIndex
+from config import SHEET_EGRESOS, SHEET_INGRESOS, SHEET_MOVIMIENTOS
+from finance import (
+    cuenta_bolsa_normal,
+    cuenta_ingreso,
+    cuenta_pago,
+    new_bucket,
+    patrimonio_bolsa,
+    patrimonio_ingreso,
+    patrimonio_maps,
+    periodo_index,
+    periodos,
+    table_plan,
+)
+from fx import FIXED_RATES, FxRates
+from helpers import parse_fecha, to_float
+from snapshot import LedgerSnapshot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def int_array(xs):
+    if np is not None:
+        return np.asarray(xs, dtype=np.int64)
+    return array("q", xs)
+
+def take(lookup: list, codes, kind: str = "d"):
+    if np is not None:
+        return np.asarray(lookup, dtype=np.float64 if kind == "d" else np.int64)[codes]
+    return array(kind, [lookup[c] for c in codes])
+
+def dict_encode(items) -> tuple:
+    lookup = {}
+    firsts = []
+    codes = []
+    for i, v in enumerate(items):
+        c = lookup.get(v)
+        if c is None:
+            c = lookup[v] = len(firsts)
+            firsts.append(i)
+        codes.append(c)
+    return int_array(codes), list(lookup), firsts
+
+def range_mask(ordinals, start: int, end: int):
+    if np is not None:
+        return (ordinals >= start) & (ordinals < end)
+    return [start <= o < end for o in ordinals]
+
+def masked_sum(values, mask) -> float:
+    if np is not None:
+        return float(values[mask].sum())
+    return sum(v for v, m in zip(values, mask) if m)
+
+def multiply(a, b):
+    if np is not None:
+        return a * b
+    return array("d", [x * y for x, y in zip(a, b)])
+
+def pick_nonzero(primary, fallback):
+    if np is not None:
+        return np.where(np.abs(primary) > 1e-9, primary, fallback)
+    return array("d", [p if abs(p) > 1e-9 else f for p, f in zip(primary, fallback)])
+
+def group_sum(codes, weights, n: int, mask=None) -> list[float]:
+    if np is not None:
+        w = weights if mask is None else np.where(mask, weights, 0.0)
+        return np.bincount(codes, weights=w, minlength=n).tolist()
+    out = [0.0] * n
+    if mask is None:
+        for c, w in zip(codes, weights):
+            out[c] += w
+    else:
+        for c, w, m in zip(codes, weights, mask):
+            if m:
+                out[c] += w
+    return out
+
+def first_seen(codes, mask) -> list[int]:
+    if np is not None:
+        picked = codes[mask]
+        uniq, first = np.unique(picked, return_index=True)
+        return uniq[np.argsort(first)].tolist()
+    seen = {}
+    for c, m in zip(codes, mask):
+        if m and c not in seen:
+            seen[c] = None
+    return list(seen)
+
+class ColumnarTable:
+    def __init__(self, rows: list[list[str]], plan: dict):
+        self.rows = rows
+        self.plan = plan
+        self._cols = {}
+
+    def encoded(self, *fields: str) -> tuple:
+        key = ("enc",) + fields
+        if key not in self._cols:
+            getters = [self.plan[f] for f in fields]
+            if len(getters) == 1:
+                g = getters[0]
+                items = (g(r) for r in self.rows)
+            else:
+                items = (tuple(g(r) for g in getters) for r in self.rows)
+            self._cols[key] = dict_encode(items)
+        return self._cols[key]
+
+    def floats(self, field: str):
+        key = ("float", field)
+        if key not in self._cols:
+            codes, uniques, _ = self.encoded(field)
+            self._cols[key] = take([to_float(u) for u in uniques], codes)
+        return self._cols[key]
+
+    def ordinals(self, field: str = "fecha"):
+        key = ("ord", field)
+        if key not in self._cols:
+            codes, uniques, _ = self.encoded(field)
+            parsed = [parse_fecha(u) for u in uniques]
+            self._cols[key] = take([f.toordinal() if f else 0 for f in parsed], codes, "q")
+        return self._cols[key]
+
+    def rates(self, fx: FxRates, field: str = "fecha"):
+        codes, uniques, _ = self.encoded(field)
+        return take([fx.rate(u) for u in uniques], codes)
+
+def columnar_table(snap: LedgerSnapshot, tab: str) -> ColumnarTable:
+    key = ("columnar", tab)
+    if key not in snap.cache:
+        rows, plan = table_plan(snap, tab)
+        snap.cache[key] = ColumnarTable(rows, plan)
+    return snap.cache[key]
+
+def merged_legs(*sides) -> list[tuple]:
+    legs = []
+    for side, (combos, firsts, sums) in enumerate(sides):
+        for combo, first, total in zip(combos, firsts, sums):
+            legs.append((first, side, combo, total))
+    legs.sort(key=lambda x: (x[0], x[1]))
+    return legs
+
+def bucket_codes(table: ColumnarTable, bucket_of, trash: int):
+    codes, uniques, _ = table.encoded("fecha")
+    per_fecha = []
+    for u in uniques:
+        i = bucket_of(parse_fecha(u))
+        per_fecha.append(trash if i is None else i)
+    return take(per_fecha, codes, "q")
+
+def columnar_resumen_periodos(snap: LedgerSnapshot, start, end, granularidad=None) -> list[dict]:
+    buckets = [new_bucket(s, e) for s, e in periodos(start, end, granularidad)]
+    bucket_of = periodo_index(start, end, granularidad)
+    n = len(buckets)
+
+    ing = columnar_table(snap, SHEET_INGRESOS)
+    ing_sums = group_sum(bucket_codes(ing, bucket_of, n), ing.floats("monto"), n + 1)
+
+    egr = columnar_table(snap, SHEET_EGRESOS)
+    monto = egr.floats("monto")
+    b_codes = bucket_codes(egr, bucket_of, n)
+    egr_sums = group_sum(b_codes, monto, n + 1)
+
+    cat_codes, cats, _ = egr.encoded("categoria")
+    k = len(cats)
+    combined = b_codes * k + cat_codes if np is not None else int_array([b * k + c for b, c in zip(b_codes, cat_codes)])
+    mask = range_mask(b_codes, 0, n)
+    cat_sums = group_sum(combined, monto, (n + 1) * k, mask)
+
+    for i, b in enumerate(buckets):
+        b["ingresos"] = ing_sums[i]
+        b["egresos"] = egr_sums[i]
+    for code in first_seen(combined, mask):
+        i, c = divmod(code, k)
+        gastos = buckets[i]["gastos"]
+        cat = str(cats[c] or "").strip()
+        gastos[cat] = gastos.get(cat, 0.0) + cat_sums[code]
+
+    return buckets
+
+def columnar_saldos(snap: LedgerSnapshot, rules: AccountIndex) -> dict[str, float]:
+    saldos = defaultdict(float)
+
+    ing = columnar_table(snap, SHEET_INGRESOS)
+    codes, combos, _ = ing.encoded("categoria", "metodo", "banco")
+    for combo, total in zip(combos, group_sum(codes, ing.floats("monto"), len(combos))):
+        cuenta = cuenta_ingreso(*combo, rules)
+        if cuenta:
+            saldos[cuenta] += total
+
+    egr = columnar_table(snap, SHEET_EGRESOS)
+    codes, combos, _ = egr.encoded("metodo", "banco")
+    for combo, total in zip(combos, group_sum(codes, egr.floats("monto"), len(combos))):
+        cuenta = cuenta_pago(*combo, rules)
+        if cuenta:
+            saldos[cuenta] -= total
+
+    mov = columnar_table(snap, SHEET_MOVIMIENTOS)
+    monto = mov.floats("monto")
+    entrada = pick_nonzero(mov.floats("monto_destino"), monto)
+    out_codes, out_combos, out_firsts = mov.encoded("bolsa_rem", "rem")
+    in_codes, in_combos, in_firsts = mov.encoded("bolsa_des", "des")
+    legs = merged_legs(
+        (out_combos, out_firsts, [-x for x in group_sum(out_codes, monto, len(out_combos))]),
+        (in_combos, in_firsts, group_sum(in_codes, entrada, len(in_combos))),
+    )
+    for _, _, combo, total in legs:
+        cuenta = cuenta_bolsa_normal(*combo, rules)
+        if cuenta:
+            saldos[cuenta] += total
+
+    return saldos
+
+def columnar_patrimonio(snap: LedgerSnapshot, idx: AccountIndex, fx: FxRates = FIXED_RATES) -> dict:
+    maps = patrimonio_maps()
+
+    ing = columnar_table(snap, SHEET_INGRESOS)
+    monto = ing.floats("monto")
+    codes, combos, _ = ing.encoded("categoria", "metodo")
+    totals = group_sum(codes, monto, len(combos))
+    totals_gtq = group_sum(codes, multiply(monto, ing.rates(fx)), len(combos))
+    for (categoria, metodo), total, total_gtq in zip(combos, totals, totals_gtq):
+        patrimonio_ingreso(maps, categoria, metodo, total, idx, total_gtq)
+
+    mov = columnar_table(snap, SHEET_MOVIMIENTOS)
+    monto = mov.floats("monto")
+    entrada = pick_nonzero(mov.floats("monto_destino"), monto)
+    tasa = mov.rates(fx)
+    in_codes, in_combos, in_firsts = mov.encoded("bolsa_des", "des", "persona")
+    out_codes, out_combos, out_firsts = mov.encoded("bolsa_rem", "rem", "persona")
+    in_sums = zip(group_sum(in_codes, entrada, len(in_combos)), group_sum(in_codes, multiply(entrada, tasa), len(in_combos)))
+    out_sums = zip(group_sum(out_codes, monto, len(out_combos)), group_sum(out_codes, multiply(monto, tasa), len(out_combos)))
+    legs = merged_legs(
+        (in_combos, in_firsts, list(in_sums)),
+        (out_combos, out_firsts, [(-x, -y) for x, y in out_sums]),
+    )
+    for _, _, (bolsa, cuenta, persona), (total, total_gtq) in legs:
+        patrimonio_bolsa(maps, bolsa, cuenta, persona, total, idx, total_gtq)
+
+    return maps
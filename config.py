@@ -5,6 +5,41 @@ from zoneinfo import ZoneInfo
 BOT_TOKEN = os.environ["BOT_TOKEN"]
 USER_SHEETS = json.loads(os.environ["USER_SHEETS"])
 SERVICE_ACCOUNT_INFO = json.loads(os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"])
+SHEET_HANDLE_TTL = int(os.environ.get("SHEET_HANDLE_TTL", "900"))
+SHEETS_MAX_WORKERS = int(os.environ.get("SHEETS_MAX_WORKERS", "8"))
+SHEETS_PER_USER_LIMIT = int(os.environ.get("SHEETS_PER_USER_LIMIT", "2"))
+SHEETS_READS_PER_MINUTE = float(os.environ.get("SHEETS_READS_PER_MINUTE", "60"))
+SHEETS_WRITES_PER_MINUTE = float(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60"))
+SHEETS_MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", "5"))
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+LEDGER_MIRROR = os.environ.get("LEDGER_MIRROR", "1") == "1"
+CIERRES = os.environ.get("CIERRES", "1") == "1"
+COLUMNAR_ENGINE = os.environ.get("FINANCE_ENGINE", "python") == "columnar"
+JOBS_CONCURRENCY = int(os.environ.get("JOBS_CONCURRENCY", "4"))
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+TELEGRAM_SEND_RATE = float(os.environ.get("TELEGRAM_SEND_RATE", "20"))
+PREWARM_MINUTES = int(os.environ.get("PREWARM_MINUTES", "10"))
+WRITE_FLUSH_SECONDS = float(os.environ.get("WRITE_FLUSH_SECONDS", "2"))
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "20"))
+WRITE_MAX_ATTEMPTS = int(os.environ.get("WRITE_MAX_ATTEMPTS", "5"))
+PROCESSED_KEY_TTL = int(os.environ.get("PROCESSED_KEY_TTL", "604800"))
+DEBT_CACHE_TTL = int(os.environ.get("DEBT_CACHE_TTL", "120"))
+CATALOG_TTL = int(os.environ.get("CATALOG_TTL", "600"))
+FX_TTL = int(os.environ.get("FX_TTL", "3600"))
+FX_RATES_FILE = os.environ.get("FX_RATES_FILE", "")
+STATE_FLUSH_SECONDS = float(os.environ.get("STATE_FLUSH_SECONDS", "10"))
+BOT_MODE = os.environ.get("BOT_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").rstrip("/")
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise SystemExit("BOT_MODE=webhook requiere WEBHOOK_URL (URL pública https del bot)")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", os.environ.get("PORT", "8443")))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram").strip("/")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
+ADMIN_IDS = {x.strip() for x in os.environ.get("ADMIN_IDS", "").split(",") if x.strip()}
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "500"))
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
 
 SHEET_INGRESOS = "Ingresos"
 SHEET_EGRESOS = "Egresos"
@@ -12,6 +47,7 @@ SHEET_MOVIMIENTOS = "Movimientos"
 SHEET_RESUMEN = "Resumen"
 SHEET_CATEGORIAS = "Categorías"
 SHEET_DEUDAS = "Deudas"
+SHEET_TIPO_CAMBIO = "TipoCambio"
 
 USD_TO_GTQ = 7.7
 TZ = ZoneInfo("America/Guatemala")
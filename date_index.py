@@ -0,0 +1,92 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from helpers import parse_fecha
+from metrics import add_rows
+from snapshot import LedgerSnapshot
+
+_indexes: dict[tuple[str, str], tuple[int, "DateIndex"]] = {}
+_lock = threading.Lock()
+_TAIL_INSERTS = 64
+
+class DateIndex:
+    def __init__(self):
+        self.ordinals = array("l")
+        self.positions = array("l")
+        self.count = 0
+
+    def extend(self, fechas):
+        parsed = {}
+        nuevos = []
+        for raw in fechas:
+            pos = self.count
+            self.count += 1
+            if raw not in parsed:
+                f = parse_fecha(raw)
+                parsed[raw] = f.toordinal() if f else None
+            o = parsed[raw]
+            if o is not None:
+                nuevos.append((o, pos))
+        if not nuevos:
+            return
+        last = self.ordinals[-1] if self.ordinals else None
+        if (last is None or nuevos[0][0] >= last) and all(
+            a[0] <= b[0] for a, b in zip(nuevos, nuevos[1:])
+        ):
+            self.ordinals.extend(o for o, _ in nuevos)
+            self.positions.extend(p for _, p in nuevos)
+        elif len(nuevos) <= _TAIL_INSERTS:
+            for o, pos in nuevos:
+                i = bisect_right(self.ordinals, o)
+                self.ordinals.insert(i, o)
+                self.positions.insert(i, pos)
+        else:
+            pares = sorted([*zip(self.ordinals, self.positions), *nuevos])
+            self.ordinals = array("l", (o for o, _ in pares))
+            self.positions = array("l", (p for _, p in pares))
+
+    def between(self, start: date, end: date, limit: int = None) -> list[tuple[int, date]]:
+        lo = bisect_left(self.ordinals, start.toordinal())
+        hi = bisect_left(self.ordinals, end.toordinal(), lo)
+        hits = zip(self.positions[lo:hi], self.ordinals[lo:hi])
+        if limit is not None:
+            hits = (h for h in hits if h[0] < limit)
+        return [(pos, date.fromordinal(o)) for pos, o in sorted(hits)]
+
+def build_index(rows: list, fecha) -> DateIndex:
+    idx = DateIndex()
+    idx.extend(fecha(r) for r in rows)
+    return idx
+
+def shared_index(sheet_id: str, tab: str, gen: int, rows: list, fecha) -> DateIndex:
+    with _lock:
+        hit = _indexes.get((sheet_id, tab))
+        if hit is None or hit[0] != gen:
+            hit = (gen, DateIndex())
+            _indexes[(sheet_id, tab)] = hit
+        idx = hit[1]
+        if idx.count < len(rows):
+            idx.extend(fecha(r) for r in rows[idx.count:])
+    return idx
+
+def date_index(snap: LedgerSnapshot, tab: str):
+    key = ("fechas", tab)
+    if key not in snap.cache:
+        from finance import table_plan
+        rows, plan = table_plan(snap, tab)
+        gen = snap.generations.get(tab)
+        if snap.sheet_id and gen is not None:
+            snap.cache[key] = shared_index(snap.sheet_id, tab, gen, rows, plan["fecha"])
+        else:
+            snap.cache[key] = build_index(rows, plan["fecha"])
+    return snap.cache[key]
+
+def rows_between(snap: LedgerSnapshot, tab: str, start: date, end: date) -> list[tuple[list, date]]:
+    rows = snap.table(tab).rows
+    idx = date_index(snap, tab)
+    with _lock:
+        hits = idx.between(start, end, len(rows))
+    add_rows(len(hits))
+    return [(rows[pos], f) for pos, f in hits]
@@ -0,0 +1,24 @@
+import time
+
+from config import DEBT_CACHE_TTL, SHEET_DEUDAS
+from sheets_service import get_sheet_id, write_version
+from snapshot import LedgerSnapshot, load_snapshot
+
+_cache: dict[str, dict] = {}
+
+def invalidate_deudas(sheet_id: str):
+    _cache.pop(sheet_id, None)
+
+def load_deudas_snapshot(gc, uid: int, force: bool = False) -> LedgerSnapshot:
+    from write_queue import flush_before_read
+
+    sheet_id = get_sheet_id(uid)
+    flush_before_read(gc, uid)
+    version = write_version(sheet_id)
+    hit = _cache.get(sheet_id)
+    if hit and not force and hit["version"] == version and time.monotonic() - hit["at"] < DEBT_CACHE_TTL:
+        return LedgerSnapshot(tables={SHEET_DEUDAS: hit["table"]})
+
+    snap = load_snapshot(gc, uid, tabs=(SHEET_DEUDAS,))
+    _cache[sheet_id] = {"table": snap.table(SHEET_DEUDAS), "version": version, "at": time.monotonic()}
+    return snap
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import random
+import time
+
+from gspread.exceptions import APIError
+from requests.exceptions import RequestException
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from config import JOBS_CONCURRENCY, JOBS_MAX_ATTEMPTS, TELEGRAM_SEND_RATE
+from renderers import split_message
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_API_CODES = {429, 500, 502, 503, 504}
+
+class SendLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+_limiter = SendLimiter(TELEGRAM_SEND_RATE)
+
+def is_transient(e: Exception) -> bool:
+    if isinstance(e, (BadRequest, Forbidden)):
+        return False
+    if isinstance(e, (RetryAfter, NetworkError, ConnectionError, TimeoutError, RequestException)):
+        return True
+    return isinstance(e, APIError) and e.code in TRANSIENT_API_CODES
+
+def backoff(e: Exception, attempt: int, base: float) -> float:
+    if isinstance(e, RetryAfter):
+        retry_after = e.retry_after
+        return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+    return base * (2 ** (attempt - 1)) * (0.5 + random.random())
+
+async def with_retries(make_call, stats: dict, attempts: int = JOBS_MAX_ATTEMPTS, base: float = 1.0):
+    for attempt in range(1, attempts + 1):
+        stats["intentos"] += 1
+        try:
+            return await make_call()
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            await asyncio.sleep(backoff(e, attempt, base))
+
+async def send_text(bot, chat_id: int, text: str, stats: dict = None):
+    stats = stats if stats is not None else {"intentos": 0}
+    for chunk in split_message(text):
+        async def send_chunk(chunk=chunk):
+            await _limiter.wait()
+            return await bot.send_message(chat_id=chat_id, text=chunk)
+        await with_retries(send_chunk, stats)
+
+async def fan_out(nombre: str, uids: list[int], build, send=None, concurrency: int = JOBS_CONCURRENCY) -> list[dict]:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(uid: int) -> dict:
+        stats = {"uid": uid, "ok": False, "intentos": 0, "segundos": 0.0, "error": ""}
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                txt = await with_retries(lambda: build(uid), stats)
+                if txt and send is not None:
+                    await send(uid, txt, stats)
+                stats["ok"] = True
+            except Exception as e:
+                stats["error"] = f"{type(e).__name__}: {e}"
+            stats["segundos"] = time.perf_counter() - t0
+        return stats
+
+    t0 = time.perf_counter()
+    report = await asyncio.gather(*(run_one(uid) for uid in uids))
+    log_report(nombre, report, time.perf_counter() - t0)
+    return report
+
+def log_report(nombre: str, report: list[dict], total: float):
+    fallos = [r for r in report if not r["ok"]]
+    logger.info(
+        "%s: %d usuarios, %d ok, %d con error en %.2fs",
+        nombre, len(report), len(report) - len(fallos), len(fallos), total,
+    )
+    for r in report:
+        if r["ok"]:
+            logger.info("%s uid=%s %.2fs intentos=%d", nombre, r["uid"], r["segundos"], r["intentos"])
+        else:
+            logger.warning("%s uid=%s %.2fs intentos=%d error=%s", nombre, r["uid"], r["segundos"], r["intentos"], r["error"])
@@ -1,280 +1,396 @@
 from collections import defaultdict
 from datetime import datetime, timedelta
 
-from catalogs import canon_cuenta, col_clean, get_investment_accounts_from_catalog
+from catalogs import AccountIndex, account_index, col_clean
 from config import (
     BOLSA_NORMAL,
-    INV_CUENTAS_DEFAULT,
+    CIERRES,
+    COLUMNAR_ENGINE,
     SHEET_CATEGORIAS,
     SHEET_DEUDAS,
     SHEET_EGRESOS,
     SHEET_INGRESOS,
     SHEET_MOVIMIENTOS,
     TZ,
-    USD_TO_GTQ,
 )
-from helpers import month_range, norm_key, parse_fecha, pick, to_float, week_range
-from sheet_utils import build_header_map, cell, row_cell
-from sheets_service import get_sheet_for_user
-
-def build_resumen_mes(gc, uid: int) -> str:
-    sh = get_sheet_for_user(gc, uid)
-    ws_ing = sh.worksheet(SHEET_INGRESOS)
-    ws_egr = sh.worksheet(SHEET_EGRESOS)
-
-    today = datetime.now(TZ).date()
-    start, end = month_range(today)
-
-    ing_rows = ws_ing.get_all_records()
-    egr_rows = ws_egr.get_all_records()
-
-    total_ing = 0.0
-    total_egr = 0.0
-    gastos_por_categoria = defaultdict(float)
-
-    for r in ing_rows:
-        f = parse_fecha(pick(r, "FECHA", "Fecha"))
-        if not f or not (start <= f < end):
-            continue
-        total_ing += to_float(pick(r, "MONTO", "Monto"))
-
-    for r in egr_rows:
-        f = parse_fecha(pick(r, "FECHA", "Fecha"))
+from fx import FIXED_RATES, FxRates
+from helpers import (
+    month_range,
+    norm_key,
+    period_end,
+    period_label,
+    period_start,
+    to_float,
+    week_range,
+)
+from metrics import add_rows
+from sheet_utils import compile_plan
+from snapshot import LedgerSnapshot
+
+ING_COLS = {
+    "fecha": ("FECHA", "Fecha"),
+    "categoria": ("CATEGORÍA", "CATEGORIA", "Categoría", "Categoria"),
+    "monto": ("MONTO", "Monto"),
+    "metodo": ("MÉTODO", "METODO", "Metodo"),
+    "banco": ("BANCO", "Banco"),
+}
+EGR_COLS = ING_COLS
+MOV_COLS = {
+    "fecha": ("FECHA", "Fecha"),
+    "bolsa_rem": ("BOLSA_REMITENTE",),
+    "rem": ("REMITENTE",),
+    "bolsa_des": ("BOLSA_DESTINO",),
+    "des": ("DESTINO",),
+    "persona": ("PERSONA_PRESTAMO", "PERSONAS_PRESTAMO", "PERSONA PRESTAMO"),
+    "monto": ("MONTO", "Monto"),
+    "monto_destino": ("MONTO_DESTINO", "Monto_destino"),
+}
+DEU_COLS = {
+    "nombre": ("NOMBRE",),
+    "acreedor": ("A QUIÉN LE DEBO", "A QUIEN LE DEBO"),
+    "fecha_pago": ("FECHA DE PAGO",),
+    "cuota": ("CUOTA",),
+    "meses": ("MESES",),
+    "pagados": ("PAGADOS",),
+    "pendientes": ("PENDIENTES",),
+    "saldo": ("SALDO",),
+    "estado": ("ESTADO",),
+}
+TAB_COLS = {
+    SHEET_INGRESOS: ING_COLS,
+    SHEET_EGRESOS: EGR_COLS,
+    SHEET_MOVIMIENTOS: MOV_COLS,
+    SHEET_DEUDAS: DEU_COLS,
+}
+
+def table_plan(snap: LedgerSnapshot, tab: str):
+    t = snap.table(tab)
+    add_rows(len(t.rows))
+    return t.rows, compile_plan(t.hmap, TAB_COLS[tab])
+
+MAX_PERIODOS = 400
+
+def periodos(start, end, granularidad=None) -> list[tuple]:
+    if not granularidad:
+        return [(start, end)]
+    out = []
+    p = period_start(start, granularidad)
+    while p < end:
+        nxt = period_end(p, granularidad)
+        out.append((max(p, start), min(nxt, end)))
+        if len(out) > MAX_PERIODOS:
+            raise ValueError(f"Demasiados periodos (máx. {MAX_PERIODOS}). Usa una granularidad mayor.")
+        p = nxt
+    return out
+
+def periodo_index(start, end, granularidad=None):
+    index = {p: i for i, (p, _) in enumerate(periodos(start, end, granularidad))}
+    first = next(iter(index))
+
+    def bucket(f):
         if not f or not (start <= f < end):
-            continue
-        monto = to_float(pick(r, "MONTO", "Monto"))
-        cat = str(pick(r, "CATEGORÍA", "CATEGORIA", "Categoría", "Categoria") or "").strip()
-        total_egr += monto
-        gastos_por_categoria[cat] += monto
-
-    balance = total_ing - total_egr
-    top = sorted(gastos_por_categoria.items(), key=lambda x: x[1], reverse=True)[:6]
-    top_txt = "\n".join([f"- {c}: {v:,.2f}" for c, v in top]) if top else "- (sin egresos aún)"
-
+            return None
+        if not granularidad:
+            return 0
+        return index[max(period_start(f, granularidad), first)]
+    return bucket
+
+def new_bucket(start, end) -> dict:
+    return {"start": start, "end": end, "ingresos": 0.0, "egresos": 0.0, "gastos": {}}
+
+def resumen_periodos(snap: LedgerSnapshot, start, end, granularidad=None) -> list[dict]:
+    if COLUMNAR_ENGINE:
+        from columnar import columnar_resumen_periodos
+        return columnar_resumen_periodos(snap, start, end, granularidad)
+
+    from date_index import rows_between
+
+    buckets = [new_bucket(s, e) for s, e in periodos(start, end, granularidad)]
+    bucket_of = periodo_index(start, end, granularidad)
+    ing = compile_plan(snap.table(SHEET_INGRESOS).hmap, ING_COLS)
+    egr = compile_plan(snap.table(SHEET_EGRESOS).hmap, EGR_COLS)
+
+    ing_monto = ing["monto"]
+    for r, f in rows_between(snap, SHEET_INGRESOS, start, end):
+        buckets[bucket_of(f)]["ingresos"] += to_float(ing_monto(r))
+
+    egr_monto, egr_cat = egr["monto"], egr["categoria"]
+    for r, f in rows_between(snap, SHEET_EGRESOS, start, end):
+        monto = to_float(egr_monto(r))
+        cat = str(egr_cat(r) or "").strip()
+        b = buckets[bucket_of(f)]
+        b["egresos"] += monto
+        b["gastos"][cat] = b["gastos"].get(cat, 0.0) + monto
+
+    return buckets
+
+def resumen_totales(buckets: list[dict]) -> tuple[float, float, dict[str, float]]:
+    gastos_por_categoria = defaultdict(float)
+    for b in buckets:
+        for cat, v in b["gastos"].items():
+            gastos_por_categoria[cat] += v
     return (
-        f"Resumen del mes ({start} a {end - timedelta(days=1)}):\n"
-        f"Ingresos: {total_ing:,.2f}\n"
-        f"Egresos: {total_egr:,.2f}\n"
-        f"Balance: {balance:,.2f}\n\n"
-        f"Top gastos:\n{top_txt}"
+        sum(b["ingresos"] for b in buckets),
+        sum(b["egresos"] for b in buckets),
+        dict(gastos_por_categoria),
     )
 
-def build_resumen_semana(gc, uid: int) -> str:
-    sh = get_sheet_for_user(gc, uid)
-    ws_ing = sh.worksheet(SHEET_INGRESOS)
-    ws_egr = sh.worksheet(SHEET_EGRESOS)
-
-    today = datetime.now(TZ).date()
-    start, end = week_range(today)
-
-    ing_rows = ws_ing.get_all_records()
-    egr_rows = ws_egr.get_all_records()
-
-    total_ing = 0.0
-    total_egr = 0.0
-    gastos_por_categoria = defaultdict(float)
-
-    for r in ing_rows:
-        f = parse_fecha(pick(r, "FECHA", "Fecha"))
-        if not f or not (start <= f < end):
-            continue
-        total_ing += to_float(pick(r, "MONTO", "Monto"))
-
-    for r in egr_rows:
-        f = parse_fecha(pick(r, "FECHA", "Fecha"))
-        if not f or not (start <= f < end):
-            continue
-        monto = to_float(pick(r, "MONTO", "Monto"))
-        cat = str(pick(r, "CATEGORÍA", "CATEGORIA", "Categoría", "Categoria") or "").strip()
-        total_egr += monto
-        gastos_por_categoria[cat] += monto
+def top_gastos(gastos_por_categoria: dict[str, float], n: int = 6) -> list[tuple[str, float]]:
+    return sorted(gastos_por_categoria.items(), key=lambda x: x[1], reverse=True)[:n]
 
+def render_resumen(titulo: str, start, end, total_ing: float, total_egr: float, gastos_por_categoria: dict[str, float]) -> str:
     balance = total_ing - total_egr
-    top = sorted(gastos_por_categoria.items(), key=lambda x: x[1], reverse=True)[:6]
+    top = top_gastos(gastos_por_categoria)
     top_txt = "\n".join([f"- {c}: {v:,.2f}" for c, v in top]) if top else "- (sin egresos aún)"
 
     return (
-        f"Resumen semanal ({start} a {end - timedelta(days=1)}):\n"
+        f"{titulo} ({start} a {end - timedelta(days=1)}):\n"
         f"Ingresos: {total_ing:,.2f}\n"
         f"Egresos: {total_egr:,.2f}\n"
         f"Balance: {balance:,.2f}\n\n"
         f"Top gastos:\n{top_txt}"
     )
 
-def build_saldos_dinamicos(
-    gc,
-    uid: int,
-    cuentas: list[str],
+def render_periodo(b: dict, granularidad: str) -> str:
+    balance = b["ingresos"] - b["egresos"]
+    lines = [
+        f"{period_label(b['start'], granularidad)}: "
+        f"+{b['ingresos']:,.2f} / -{b['egresos']:,.2f} = {balance:,.2f}"
+    ]
+    lines += [f"  · {c}: {v:,.2f}" for c, v in top_gastos(b["gastos"], 3)]
+    return "\n".join(lines)
+
+def build_resumen(snap: LedgerSnapshot, rango=None, granularidad=None, titulo: str = "Resumen") -> str:
+    start, end = rango or month_range(datetime.now(TZ).date())
+    buckets = resumen_periodos(snap, start, end, granularidad)
+    txt = render_resumen(titulo, start, end, *resumen_totales(buckets))
+    if not granularidad:
+        return txt
+    detalle = "\n".join(render_periodo(b, granularidad) for b in buckets if b["ingresos"] or b["egresos"])
+    detalle = detalle or "- (sin movimientos)"
+    return f"{txt}\n\nPor periodo:\n{detalle}"
+
+def build_resumen_mes(snap: LedgerSnapshot) -> str:
+    return build_resumen(snap, month_range(datetime.now(TZ).date()), titulo="Resumen del mes")
+
+def build_resumen_semana(snap: LedgerSnapshot) -> str:
+    return build_resumen(snap, week_range(datetime.now(TZ).date()), titulo="Resumen semanal")
+
+def saldo_rules(
+    cuentas_catalogo: list[str],
     *,
     inv_cuentas: set[str] = None,
     ahorro_cuenta: str = "Ahorro",
     prestamos_cuenta: str = "Préstamos",
-) -> dict[str, float]:
-    if inv_cuentas is None:
-        inv_cuentas = INV_CUENTAS_DEFAULT
-
-    inv_cuentas_n = {norm_key(x) for x in inv_cuentas}
-    ahorro_cuenta_n = norm_key(ahorro_cuenta)
-    prestamos_cuenta_n = norm_key(prestamos_cuenta)
-
-    sh = get_sheet_for_user(gc, uid)
-    ws_ing = sh.worksheet(SHEET_INGRESOS)
-    ws_egr = sh.worksheet(SHEET_EGRESOS)
-    ws_mov = sh.worksheet(SHEET_MOVIMIENTOS)
-    ws_cat = sh.worksheet(SHEET_CATEGORIAS)
-
-    cuentas_catalogo = col_clean(ws_cat.col_values(6))
-
-    def is_excluded_account(acc: str) -> bool:
-        k = norm_key(acc)
-        return (k in inv_cuentas_n) or (k == ahorro_cuenta_n) or (k == prestamos_cuenta_n)
-
-    saldos = defaultdict(float)
-
-    ing_vals = ws_ing.get("A1:G")
-    ing_h = build_header_map(ing_vals)
-    for row in ing_vals[1:]:
-        if not any((c or "").strip() for c in row):
-            continue
-        categoria = str(cell(row, ing_h, "CATEGORÍA", "CATEGORIA", "Categoria") or "").strip().lower()
-        if categoria in {"inversiones", "prestamos"}:
-            continue
-
-        metodo = str(cell(row, ing_h, "MÉTODO", "METODO", "Metodo") or "").strip()
-        banco = str(cell(row, ing_h, "BANCO", "Banco") or "").strip()
-        cuenta = banco if norm_key(metodo) == "transferencia" else metodo
-        cuenta = canon_cuenta(cuenta, cuentas_catalogo)
-        if not cuenta or is_excluded_account(cuenta):
-            continue
-        saldos[cuenta] += to_float(cell(row, ing_h, "MONTO", "Monto"))
-
-    egr_vals = ws_egr.get("A1:F")
-    egr_h = build_header_map(egr_vals)
-    for row in egr_vals[1:]:
-        if not any((c or "").strip() for c in row):
-            continue
-        metodo = str(cell(row, egr_h, "MÉTODO", "METODO", "Metodo") or "").strip()
-        banco = str(cell(row, egr_h, "BANCO", "Banco") or "").strip()
-        cuenta = banco if norm_key(metodo) == "transferencia" else metodo
-        cuenta = canon_cuenta(cuenta, cuentas_catalogo)
-        if not cuenta or is_excluded_account(cuenta):
-            continue
-        saldos[cuenta] -= to_float(cell(row, egr_h, "MONTO", "Monto"))
-
-    mov_vals = ws_mov.get("A1:I")
-    mov_h = build_header_map(mov_vals)
-    for row in mov_vals[1:]:
-        if not any((c or "").strip() for c in row):
-            continue
-        bolsa_rem = str(cell(row, mov_h, "BOLSA_REMITENTE") or "").strip() or BOLSA_NORMAL
-        rem_raw = str(cell(row, mov_h, "REMITENTE") or "").strip()
-        bolsa_des = str(cell(row, mov_h, "BOLSA_DESTINO") or "").strip() or BOLSA_NORMAL
-        des_raw = str(cell(row, mov_h, "DESTINO") or "").strip()
-        rem = canon_cuenta(rem_raw, cuentas_catalogo)
-        des = canon_cuenta(des_raw, cuentas_catalogo)
-        out_amt = to_float(cell(row, mov_h, "MONTO", "Monto"))
-        md = to_float(cell(row, mov_h, "MONTO_DESTINO", "Monto_destino"))
-        in_amt = md if abs(md) > 1e-9 else out_amt
-
-        if norm_key(bolsa_rem) == norm_key(BOLSA_NORMAL) and rem and not is_excluded_account(rem):
-            saldos[rem] -= out_amt
-        if norm_key(bolsa_des) == norm_key(BOLSA_NORMAL) and des and not is_excluded_account(des):
-            saldos[des] += in_amt
+) -> AccountIndex:
+    return account_index(
+        cuentas_catalogo,
+        inv_cuentas=inv_cuentas,
+        ahorro_cuenta=ahorro_cuenta,
+        prestamos_cuenta=prestamos_cuenta,
+    )
 
+def cuenta_pago(metodo, banco, rules: AccountIndex) -> str:
+    metodo = str(metodo or "").strip()
+    banco = str(banco or "").strip()
+    cuenta = rules.canon(banco if norm_key(metodo) == "transferencia" else metodo)
+    if not cuenta or rules.is_excluded(cuenta):
+        return ""
+    return cuenta
+
+def cuenta_ingreso(categoria, metodo, banco, rules: AccountIndex) -> str:
+    if str(categoria or "").strip().lower() in {"inversiones", "prestamos"}:
+        return ""
+    return cuenta_pago(metodo, banco, rules)
+
+def cuenta_bolsa_normal(bolsa, cuenta, rules: AccountIndex) -> str:
+    bolsa = str(bolsa or "").strip() or BOLSA_NORMAL
+    if norm_key(bolsa) != norm_key(BOLSA_NORMAL):
+        return ""
+    cuenta = rules.canon(str(cuenta or "").strip())
+    if not cuenta or rules.is_excluded(cuenta):
+        return ""
+    return cuenta
+
+def monto_entrada(monto: float, monto_destino: float) -> float:
+    return monto_destino if abs(monto_destino) > 1e-9 else monto
+
+def apply_ingreso(saldos, row: list, plan: dict, rules: AccountIndex):
+    cuenta = cuenta_ingreso(plan["categoria"](row), plan["metodo"](row), plan["banco"](row), rules)
+    if cuenta:
+        saldos[cuenta] += to_float(plan["monto"](row))
+
+def apply_egreso(saldos, row: list, plan: dict, rules: AccountIndex):
+    cuenta = cuenta_pago(plan["metodo"](row), plan["banco"](row), rules)
+    if cuenta:
+        saldos[cuenta] -= to_float(plan["monto"](row))
+
+def apply_movimiento(saldos, row: list, plan: dict, rules: AccountIndex):
+    rem = cuenta_bolsa_normal(plan["bolsa_rem"](row), plan["rem"](row), rules)
+    des = cuenta_bolsa_normal(plan["bolsa_des"](row), plan["des"](row), rules)
+    if not rem and not des:
+        return
+    out_amt = to_float(plan["monto"](row))
+
+    if rem:
+        saldos[rem] -= out_amt
+    if des:
+        saldos[des] += monto_entrada(out_amt, to_float(plan["monto_destino"](row)))
+
+SALDO_APPLIERS = {
+    SHEET_INGRESOS: apply_ingreso,
+    SHEET_EGRESOS: apply_egreso,
+    SHEET_MOVIMIENTOS: apply_movimiento,
+}
+
+def saldos_con_cuentas(saldos: dict[str, float], cuentas: list[str], rules: AccountIndex) -> dict[str, float]:
+    out = defaultdict(float, saldos)
     for c in cuentas:
-        cc = canon_cuenta(c, cuentas_catalogo)
-        if not cc or is_excluded_account(cc):
+        cc = rules.canon(c)
+        if not cc or rules.is_excluded(cc):
             continue
-        saldos[cc] += 0.0
+        out[cc] += 0.0
+    return dict(out)
 
-    return dict(saldos)
+def usa_cierres(snap: LedgerSnapshot) -> bool:
+    if not CIERRES or not snap.sheet_id or snap.agregado:
+        return False
+    from cierres import cierres_de
+    return bool(cierres_de(snap.sheet_id))
 
-def build_networth(
-    gc,
-    uid: int,
-    usd_to_gtq: float = None,
+def build_saldos_dinamicos(
+    snap: LedgerSnapshot,
+    cuentas: list[str],
+    *,
     inv_cuentas: set[str] = None,
     ahorro_cuenta: str = "Ahorro",
     prestamos_cuenta: str = "Préstamos",
-) -> dict:
-    if usd_to_gtq is None:
-        usd_to_gtq = USD_TO_GTQ
-    if inv_cuentas is None:
-        inv_cuentas = INV_CUENTAS_DEFAULT
-
-    inv_set = {norm_key(x) for x in inv_cuentas}
-    ahorro_n = norm_key(ahorro_cuenta)
-    prestamos_n = norm_key(prestamos_cuenta)
-
-    sh = get_sheet_for_user(gc, uid)
-    ws_ing = sh.worksheet(SHEET_INGRESOS)
-    ws_mov = sh.worksheet(SHEET_MOVIMIENTOS)
-    ws_cat = sh.worksheet(SHEET_CATEGORIAS)
-
-    cuentas_catalogo = col_clean(ws_cat.col_values(6))
-    liquid_accounts = [c for c in cuentas_catalogo if norm_key(c) not in inv_set | {ahorro_n, prestamos_n}]
-    liquid_map = build_saldos_dinamicos(gc, uid, liquid_accounts)
-
-    ahorro_map = defaultdict(float)
-    prestamos_map = defaultdict(float)
-    inv_map = defaultdict(float)
-
-    ing_vals = ws_ing.get("A1:G")
-    ing_h = build_header_map(ing_vals)
-    for row in ing_vals[1:]:
-        if not any((c or "").strip() for c in row):
-            continue
+) -> dict[str, float]:
+    cuentas_catalogo = col_clean(snap.table(SHEET_CATEGORIAS).column(5))
+    rules = saldo_rules(
+        cuentas_catalogo,
+        inv_cuentas=inv_cuentas,
+        ahorro_cuenta=ahorro_cuenta,
+        prestamos_cuenta=prestamos_cuenta,
+    )
 
-        categoria = str(cell(row, ing_h, "CATEGORÍA", "CATEGORIA", "Categoria") or "").strip().lower()
-        monto = to_float(cell(row, ing_h, "MONTO", "Monto"))
-        metodo = canon_cuenta(str(cell(row, ing_h, "MÉTODO", "METODO", "Metodo") or "").strip(), cuentas_catalogo)
+    if usa_cierres(snap):
+        from cierres import cerrar
+        tablas = {tab: table_plan(snap, tab) for tab in SALDO_APPLIERS}
+        desde = cerrar(snap.sheet_id, tablas, rules, generaciones=snap.generations)
+        saldos = desde["maps"]["saldos"]
+        for tab, rows in desde["pendientes"].items():
+            apply_row = SALDO_APPLIERS[tab]
+            plan = tablas[tab][1]
+            for row in rows:
+                apply_row(saldos, row, plan, rules)
+        return saldos_con_cuentas(saldos, cuentas, rules)
+
+    if COLUMNAR_ENGINE:
+        from columnar import columnar_saldos
+        saldos = columnar_saldos(snap, rules)
+        return saldos_con_cuentas(saldos, cuentas, rules)
 
-        if categoria == "inversiones" and norm_key(metodo) in inv_set:
-            inv_map[metodo] += monto
-        elif categoria == "prestamos":
-            prestamos_map["General"] += monto
+    saldos = defaultdict(float)
+    for tab, apply_row in SALDO_APPLIERS.items():
+        rows, plan = table_plan(snap, tab)
+        for row in rows:
+            apply_row(saldos, row, plan, rules)
 
-    mov_vals = ws_mov.get("A1:I")
-    mov_h = build_header_map(mov_vals)
-    for row in mov_vals[1:]:
-        if not any((c or "").strip() for c in row):
-            continue
+    return saldos_con_cuentas(saldos, cuentas, rules)
+
+def patrimonio_maps() -> dict:
+    return {
+        "saldos": defaultdict(float),
+        "ahorro": defaultdict(float),
+        "prestamos": defaultdict(float),
+        "inv": defaultdict(float),
+        "inv_gtq": defaultdict(float),
+    }
 
-        bolsa_rem = str(cell(row, mov_h, "BOLSA_REMITENTE") or "").strip() or BOLSA_NORMAL
-        rem = canon_cuenta(str(cell(row, mov_h, "REMITENTE") or "").strip(), cuentas_catalogo)
-        bolsa_des = str(cell(row, mov_h, "BOLSA_DESTINO") or "").strip() or BOLSA_NORMAL
-        des = canon_cuenta(str(cell(row, mov_h, "DESTINO") or "").strip(), cuentas_catalogo)
-        persona = str(cell(row, mov_h, "PERSONA_PRESTAMO", "PERSONAS_PRESTAMO", "PERSONA PRESTAMO") or "").strip() or "General"
-        monto = to_float(cell(row, mov_h, "MONTO", "Monto"))
-        monto_dest = to_float(cell(row, mov_h, "MONTO_DESTINO", "Monto_destino"))
-        entrada = monto_dest if abs(monto_dest) > 1e-9 else monto
-
-        br = norm_key(bolsa_rem)
-        bd = norm_key(bolsa_des)
-
-        if bd == ahorro_n:
-            ahorro_map[des or "Sin cuenta"] += entrada
-        if br == ahorro_n:
-            ahorro_map[rem or "Sin cuenta"] -= monto
-
-        if bd == prestamos_n:
-            prestamos_map[persona] += entrada
-        if br == prestamos_n:
-            prestamos_map[persona] -= monto
-
-        if bd == norm_key("Inversion"):
-            inv_map[des or "Sin cuenta"] += entrada
-        if br == norm_key("Inversion"):
-            inv_map[rem or "Sin cuenta"] -= monto
-
-    for c in get_investment_accounts_from_catalog(cuentas_catalogo):
+def copy_maps(maps: dict) -> dict:
+    return {k: defaultdict(float, v) for k, v in maps.items()}
+
+def patrimonio_ingreso(maps: dict, categoria, metodo, monto: float, idx: AccountIndex, monto_gtq: float = 0.0):
+    categoria = str(categoria or "").strip().lower()
+    metodo = idx.canon(str(metodo or "").strip())
+
+    if categoria == "inversiones" and idx.is_investment(metodo):
+        maps["inv"][metodo] += monto
+        maps["inv_gtq"][metodo] += monto_gtq
+    elif categoria == "prestamos":
+        maps["prestamos"]["General"] += monto
+
+def patrimonio_bolsa(maps: dict, bolsa, cuenta, persona, monto: float, idx: AccountIndex, monto_gtq: float = 0.0):
+    b = norm_key(str(bolsa or "").strip() or BOLSA_NORMAL)
+    cuenta = idx.canon(str(cuenta or "").strip())
+
+    if b == idx.ahorro_key:
+        maps["ahorro"][cuenta or "Sin cuenta"] += monto
+    if b == idx.prestamos_key:
+        maps["prestamos"][str(persona or "").strip() or "General"] += monto
+    if b == norm_key("Inversion"):
+        maps["inv"][cuenta or "Sin cuenta"] += monto
+        maps["inv_gtq"][cuenta or "Sin cuenta"] += monto_gtq
+
+def apply_patrimonio_ingreso(maps: dict, row: list, plan: dict, idx: AccountIndex, fx: FxRates = FIXED_RATES):
+    apply_ingreso(maps["saldos"], row, plan, idx)
+    monto = to_float(plan["monto"](row))
+    tasa = fx.rate(plan["fecha"](row))
+    patrimonio_ingreso(maps, plan["categoria"](row), plan["metodo"](row), monto, idx, monto * tasa)
+
+def apply_patrimonio_egreso(maps: dict, row: list, plan: dict, idx: AccountIndex, fx: FxRates = FIXED_RATES):
+    apply_egreso(maps["saldos"], row, plan, idx)
+
+def apply_patrimonio_movimiento(maps: dict, row: list, plan: dict, idx: AccountIndex, fx: FxRates = FIXED_RATES):
+    apply_movimiento(maps["saldos"], row, plan, idx)
+    tasa = fx.rate(plan["fecha"](row))
+    persona = plan["persona"](row)
+    monto = to_float(plan["monto"](row))
+    entrada = monto_entrada(monto, to_float(plan["monto_destino"](row)))
+
+    patrimonio_bolsa(maps, plan["bolsa_des"](row), plan["des"](row), persona, entrada, idx, entrada * tasa)
+    patrimonio_bolsa(maps, plan["bolsa_rem"](row), plan["rem"](row), persona, -monto, idx, -monto * tasa)
+
+PATRIMONIO_APPLIERS = {
+    SHEET_INGRESOS: apply_patrimonio_ingreso,
+    SHEET_EGRESOS: apply_patrimonio_egreso,
+    SHEET_MOVIMIENTOS: apply_patrimonio_movimiento,
+}
+
+def patrimonio_totales(snap: LedgerSnapshot, idx: AccountIndex, fx: FxRates = FIXED_RATES) -> dict:
+    if usa_cierres(snap):
+        from cierres import totales_desde_cierre
+        tablas = {tab: table_plan(snap, tab) for tab in PATRIMONIO_APPLIERS}
+        return totales_desde_cierre(snap.sheet_id, tablas, idx, fx, snap.generations)
+
+    if COLUMNAR_ENGINE:
+        from columnar import columnar_patrimonio, columnar_saldos
+        maps = columnar_patrimonio(snap, idx, fx)
+        maps["saldos"] = columnar_saldos(snap, idx)
+        return maps
+
+    maps = patrimonio_maps()
+    for tab, apply_row in PATRIMONIO_APPLIERS.items():
+        rows, plan = table_plan(snap, tab)
+        for row in rows:
+            apply_row(maps, row, plan, idx, fx)
+    return maps
+
+def networth_result(liquid_map: dict, maps: dict, idx: AccountIndex, usd_to_gtq: float, tc_fecha=None) -> dict:
+    ahorro_map = maps["ahorro"]
+    prestamos_map = maps["prestamos"]
+    inv_map = maps["inv"]
+
+    for c in idx.investment:
         inv_map[c] += 0.0
 
     liquidez_gtq = sum(liquid_map.values())
     ahorro_gtq = sum(ahorro_map.values())
     prestamos_gtq = sum(prestamos_map.values())
     inv_total_usd = sum(inv_map.values())
-    total_gtq = liquidez_gtq + ahorro_gtq + prestamos_gtq + (inv_total_usd * usd_to_gtq)
+    inv_total_gtq = inv_total_usd * usd_to_gtq
+    total_gtq = liquidez_gtq + ahorro_gtq + prestamos_gtq + inv_total_gtq
 
     return {
         "liquid_map": dict(liquid_map),
@@ -285,32 +401,86 @@ def build_networth(
         "prestamos_gtq": prestamos_gtq,
         "inv_map": dict(inv_map),
         "inv_total_usd": inv_total_usd,
+        "inv_total_gtq": inv_total_gtq,
+        "inv_aportado_gtq": sum(maps.get("inv_gtq", {}).values()),
         "total_gtq": total_gtq,
         "tc": usd_to_gtq,
+        "tc_fecha": tc_fecha,
     }
 
-def build_deudas(gc, uid: int) -> list[dict]:
-    sh = get_sheet_for_user(gc, uid)
-    ws = sh.worksheet(SHEET_DEUDAS)
+def patrimonio_result(
+    maps: dict,
+    idx: AccountIndex,
+    cuentas: list[str] = None,
+    usd_to_gtq: float = None,
+    pasivos_gtq: float = 0.0,
+    fx: FxRates = FIXED_RATES,
+) -> dict:
+    tc_fecha = None
+    if usd_to_gtq is None:
+        usd_to_gtq, tc_fecha = fx.as_of(datetime.now(TZ).date())
+
+    liquid_map = saldos_con_cuentas(maps["saldos"], idx.liquid, idx)
+    out = networth_result(liquid_map, maps, idx, usd_to_gtq, tc_fecha)
+    out["saldos"] = saldos_con_cuentas(maps["saldos"], idx.liquid if cuentas is None else cuentas, idx)
+    out["pasivos_gtq"] = pasivos_gtq
+    out["neto_gtq"] = out["total_gtq"] - pasivos_gtq
+    return out
+
+def build_patrimonio(
+    snap: LedgerSnapshot,
+    cuentas: list[str] = None,
+    usd_to_gtq: float = None,
+    inv_cuentas: set[str] = None,
+    ahorro_cuenta: str = "Ahorro",
+    prestamos_cuenta: str = "Préstamos",
+    fx: FxRates = FIXED_RATES,
+) -> dict:
+    cuentas_catalogo = col_clean(snap.table(SHEET_CATEGORIAS).column(5))
+    idx = account_index(
+        cuentas_catalogo,
+        inv_cuentas=inv_cuentas,
+        ahorro_cuenta=ahorro_cuenta,
+        prestamos_cuenta=prestamos_cuenta,
+    )
+    pasivos_gtq = build_total_deudas(snap) if SHEET_DEUDAS in snap.tables else 0.0
+    return patrimonio_result(patrimonio_totales(snap, idx, fx), idx, cuentas, usd_to_gtq, pasivos_gtq, fx)
+
+def build_networth(
+    snap: LedgerSnapshot,
+    usd_to_gtq: float = None,
+    inv_cuentas: set[str] = None,
+    ahorro_cuenta: str = "Ahorro",
+    prestamos_cuenta: str = "Préstamos",
+    fx: FxRates = FIXED_RATES,
+) -> dict:
+    return build_patrimonio(
+        snap,
+        usd_to_gtq=usd_to_gtq,
+        inv_cuentas=inv_cuentas,
+        ahorro_cuenta=ahorro_cuenta,
+        prestamos_cuenta=prestamos_cuenta,
+        fx=fx,
+    )
 
-    vals = ws.get("A1:I")
-    hmap = build_header_map(vals)
+def build_deudas(snap: LedgerSnapshot) -> list[dict]:
+    rows, plan = table_plan(snap, SHEET_DEUDAS)
 
     deudas = []
 
-    for sheet_row_num, row in enumerate(vals[1:], start=2):
+    for sheet_row_num, row in enumerate(rows, start=2):
         if not any((c or "").strip() for c in row):
             continue
 
-        nombre = str(row_cell(row, hmap, "NOMBRE") or "").strip()
-        acreedor = str(row_cell(row, hmap, "A QUIÉN LE DEBO", "A QUIEN LE DEBO") or "").strip()
-        fecha_pago = str(row_cell(row, hmap, "FECHA DE PAGO") or "").strip()
-        cuota = to_float(row_cell(row, hmap, "CUOTA"))
-        meses = int(to_float(row_cell(row, hmap, "MESES")))
-        pagados = int(to_float(row_cell(row, hmap, "PAGADOS")))
-        pendientes = int(to_float(row_cell(row, hmap, "PENDIENTES")))
-        saldo = to_float(row_cell(row, hmap, "SALDO"))
-        estado = str(row_cell(row, hmap, "ESTADO") or "").strip()
+        nombre = str(plan["nombre"](row) or "").strip()
+        acreedor = str(plan["acreedor"](row) or "").strip()
+        fecha_pago = str(plan["fecha_pago"](row) or "").strip()
+        cuota = to_float(plan["cuota"](row))
+        meses = int(to_float(plan["meses"](row)))
+        pagados = int(to_float(plan["pagados"](row)))
+        pendientes = int(to_float(plan["pendientes"](row)))
+        saldo = to_float(plan["saldo"](row))
+        estado = str(plan["estado"](row) or "").strip()
 
         if pendientes <= 0 and meses > pagados:
             pendientes = max(meses - pagados, 0)
@@ -334,6 +504,6 @@ def build_deudas(gc, uid: int) -> list[dict]:
 
     return deudas
 
-def build_total_deudas(gc, uid: int) -> float:
-    deudas = build_deudas(gc, uid)
+def build_total_deudas(snap: LedgerSnapshot) -> float:
+    deudas = build_deudas(snap)
     return sum(d["saldo"] for d in deudas if d["estado"].lower() == "activa")
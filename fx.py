@@ -0,0 +1,109 @@
+import bisect
+import csv
+import os
+import threading
+import time
+import zlib
+from datetime import date
+
+from config import FX_RATES_FILE, FX_TTL, USD_TO_GTQ
+from helpers import parse_fecha, to_float
+from sheet_utils import build_header_map, compile_plan
+
+FX_RANGE = "A1:B"
+FX_COLS = {
+    "fecha": ("FECHA", "Fecha"),
+    "tasa": ("TASA", "TC", "USD_GTQ", "Tasa"),
+}
+
+class FxRates:
+    def __init__(self, pairs=(), default: float = USD_TO_GTQ):
+        self.pairs = tuple(sorted(dict(pairs).items()))
+        self.ordinals = [o for o, _ in self.pairs]
+        self.tasas = [t for _, t in self.pairs]
+        self.default = default
+        self._by_value = {}
+        self._firmas = None
+
+    def index(self, fecha) -> int:
+        f = parse_fecha(fecha)
+        if f is None:
+            return len(self.tasas) - 1
+        return max(bisect.bisect_right(self.ordinals, f.toordinal()) - 1, 0)
+
+    def rate(self, fecha) -> float:
+        if not self.tasas:
+            return self.default
+        tasa = self._by_value.get(fecha)
+        if tasa is None:
+            tasa = self.tasas[self.index(fecha)]
+            self._by_value[fecha] = tasa
+        return tasa
+
+    def as_of(self, fecha) -> tuple[float, date | None]:
+        if not self.tasas:
+            return self.default, None
+        i = self.index(fecha)
+        return self.tasas[i], date.fromordinal(self.ordinals[i])
+
+    def firma_hasta(self, ordinal: int) -> str:
+        if self._firmas is None:
+            acc = zlib.crc32(repr(self.default).encode("utf-8"))
+            firmas = [acc]
+            for o, t in self.pairs:
+                acc = zlib.crc32(f"{o}:{t!r}".encode("utf-8"), acc)
+                firmas.append(acc)
+            self._firmas = firmas
+        k = bisect.bisect_right(self.ordinals, ordinal)
+        return format(self._firmas[max(k, 1) if self.pairs else 0], "08x")
+
+FIXED_RATES = FxRates()
+
+def rate_pairs(values: list[list]) -> list[tuple[int, float]]:
+    if not values:
+        return []
+    plan = compile_plan(build_header_map(values), FX_COLS)
+    out = []
+    for row in values[1:]:
+        f = parse_fecha(plan["fecha"](row))
+        tasa = to_float(plan["tasa"](row))
+        if f and tasa > 0:
+            out.append((f.toordinal(), tasa))
+    return out
+
+_file_cache: dict[str, tuple[float, list]] = {}
+
+def file_pairs(path: str = FX_RATES_FILE) -> list[tuple[int, float]]:
+    if not path or not os.path.exists(path):
+        return []
+    mtime = os.path.getmtime(path)
+    hit = _file_cache.get(path)
+    if hit is None or hit[0] != mtime:
+        with open(path, encoding="utf-8", newline="") as f:
+            hit = (mtime, rate_pairs([row for row in csv.reader(f)]))
+        _file_cache[path] = hit
+    return hit[1]
+
+_cache: dict[str, dict] = {}
+_lock = threading.Lock()
+
+def rates_for(gc, uid: int) -> FxRates:
+    from sheets_service import get_sheet_id
+    from storage import storage_for
+
+    sheet_id = get_sheet_id(uid)
+    entry = _cache.get(sheet_id)
+    if entry is not None and time.monotonic() - entry["at"] <= FX_TTL:
+        return entry["rates"]
+
+    pairs = file_pairs() + rate_pairs(storage_for(uid).read_rates(gc, uid))
+    with _lock:
+        entry = _cache.get(sheet_id)
+        rates = FxRates(pairs)
+        if entry is not None and entry["rates"].pairs == rates.pairs:
+            rates = entry["rates"]
+        _cache[sheet_id] = {"rates": rates, "at": time.monotonic()}
+    return rates
+
+def invalidate_rates(sheet_id: str):
+    _cache.pop(sheet_id, None)
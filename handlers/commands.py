@@ -1,13 +1,24 @@
+from datetime import datetime
+
 from .shared import ensure_catalogs
-from auth import allowed
-from catalogs import get_catalogos, get_accounts_by_role
-from config import BANCOS, CATEG_EGR, CATEG_ING, CUENTAS, FUENTES_ING, METODOS
-from finance import build_deudas, build_networth, build_resumen_mes, build_saldos_dinamicos, build_total_deudas
-from helpers import format_money_q
+from auth import allowed, is_admin
+from balances import cerrar_meses, patrimonio_actual
+from catalogs import catalog_version, get_catalogos, get_accounts_by_role
+from config import BANCOS, CATEG_EGR, CATEG_ING, CUENTAS, FUENTES_ING, METODOS, SHEET_EGRESOS, SHEET_INGRESOS, TZ
+from debt_cache import invalidate_deudas, load_deudas_snapshot
+from finance import build_deudas, build_resumen
+from fx import invalidate_rates
+from helpers import format_money_q, month_range, parse_rango_resumen
 from keyboards import kb_deudas_activas, kb_main, kb_cuentas_pago
-from renderers import render_lines_q, render_lines_usd
+from metrics import render_stats
+from mirror import resync_user
+from renderers import render_lines_q, render_lines_usd, split_message
 from services import ejecutar_pago_deuda
+from sheets_async import run_sheets
+from sheets_service import get_sheet_id
+from snapshot import load_snapshot
 from state import st_get, st_reset
+from storage import storage_for
 
 async def whoami(update, context):
     await update.message.reply_text(f"Tu user_id es: {update.effective_user.id}")
@@ -40,8 +51,20 @@ async def resumen(update, context):
         return
     gc = context.application.bot_data["gc"]
     try:
-        txt = build_resumen_mes(gc, update.effective_user.id)
-        await update.message.reply_text(txt)
+        rango, granularidad = parse_rango_resumen(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
+    try:
+        uid = update.effective_user.id
+        lectura = rango or month_range(datetime.now(TZ).date())
+        snap = await run_sheets(uid, load_snapshot, gc, uid, tabs=(SHEET_INGRESOS, SHEET_EGRESOS), rango=lectura)
+        if rango:
+            txt = build_resumen(snap, rango, granularidad)
+        else:
+            txt = build_resumen(snap, titulo="Resumen del mes")
+        for chunk in split_message(txt):
+            await update.message.reply_text(chunk)
     except Exception as e:
         await update.message.reply_text(f"No pude generar el resumen. Error: {e}")
 
@@ -54,7 +77,9 @@ async def saldos(update, context):
     cuentas = context.user_data.get("cuentas", CUENTAS)
 
     try:
-        saldos_map = build_saldos_dinamicos(gc, update.effective_user.id, cuentas)
+        uid = update.effective_user.id
+        nw = await run_sheets(uid, patrimonio_actual, gc, uid, cuentas)
+        saldos_map = nw["saldos"]
         items = sorted(saldos_map.items(), key=lambda x: x[1], reverse=True)
         pares = [(c, format_money_q(v)) for c, v in items if c and abs(v) > 0.000001]
 
@@ -82,7 +107,9 @@ async def networth(update, context):
     gc = context.application.bot_data["gc"]
 
     try:
-        nw = build_networth(gc, update.effective_user.id)
+        uid = update.effective_user.id
+        nw = await run_sheets(uid, patrimonio_actual, gc, uid)
+        vigencia = f" (vigente desde {nw['tc_fecha']})" if nw["tc_fecha"] else ""
 
         msg = (
             "Net Worth\n\n"
@@ -94,9 +121,11 @@ async def networth(update, context):
             "Préstamos\n"
             f"{render_lines_q(nw['prestamos_map'])}\n\n"
             "Inversiones\n"
-            f"{render_lines_usd(nw['inv_map'])}\n\n"
+            f"{render_lines_usd(nw['inv_map'])}\n"
+            f"- Total: {format_money_q(nw['inv_total_gtq'])}\n"
+            f"- Aportado al TC de cada fecha: {format_money_q(nw['inv_aportado_gtq'])}\n\n"
             f"Total patrimonial (GTQ): {format_money_q(nw['total_gtq'])}\n"
-            f"TC usado: {nw['tc']}"
+            f"TC usado: {nw['tc']}{vigencia}"
         )
 
         await update.message.reply_text(msg)
@@ -114,7 +143,9 @@ async def deudas(update, context):
     gc = context.application.bot_data["gc"]
 
     try:
-        items = build_deudas(gc, update.effective_user.id)
+        uid = update.effective_user.id
+        snap = await run_sheets(uid, load_deudas_snapshot, gc, uid)
+        items = build_deudas(snap)
 
         if not items:
             await update.message.reply_text("No encontré deudas en la hoja Deudas.")
@@ -145,7 +176,9 @@ async def deudas_activas(update, context):
     gc = context.application.bot_data["gc"]
 
     try:
-        items = build_deudas(gc, update.effective_user.id)
+        uid = update.effective_user.id
+        snap = await run_sheets(uid, load_deudas_snapshot, gc, uid)
+        items = build_deudas(snap)
         activas = [d for d in items if d["estado"].lower() == "activa" and d["pendientes"] > 0]
 
         if not activas:
@@ -169,15 +202,14 @@ async def neto(update, context):
     gc = context.application.bot_data["gc"]
 
     try:
-        nw = build_networth(gc, update.effective_user.id)
-        pasivos_gtq = build_total_deudas(gc, update.effective_user.id)
-        neto_gtq = nw["total_gtq"] - pasivos_gtq
+        uid = update.effective_user.id
+        nw = await run_sheets(uid, patrimonio_actual, gc, uid, deudas=True)
 
         msg = (
             "Patrimonio Neto\n\n"
             f"Patrimonio bruto: {format_money_q(nw['total_gtq'])}\n"
-            f"Pasivos (deudas): {format_money_q(pasivos_gtq)}\n\n"
-            f"Patrimonio neto: {format_money_q(neto_gtq)}"
+            f"Pasivos (deudas): {format_money_q(nw['pasivos_gtq'])}\n\n"
+            f"Patrimonio neto: {format_money_q(nw['neto_gtq'])}"
         )
 
         await update.message.reply_text(msg)
@@ -192,7 +224,9 @@ async def pagar(update, context):
     gc = context.application.bot_data["gc"]
 
     try:
-        items = build_deudas(gc, update.effective_user.id)
+        uid = update.effective_user.id
+        snap = await run_sheets(uid, load_deudas_snapshot, gc, uid, force=True)
+        items = build_deudas(snap)
         activas = [d for d in items if d["estado"].lower() == "activa" and d["pendientes"] > 0]
 
         if not activas:
@@ -211,3 +245,63 @@ async def pagar(update, context):
 
     except Exception as e:
         await update.message.reply_text(f"No pude iniciar el pago de deuda. Error: {e}")
+
+async def cerrar_mes(update, context):
+    if not allowed(update):
+        return
+
+    gc = context.application.bot_data["gc"]
+
+    try:
+        uid = update.effective_user.id
+        cierre = await run_sheets(uid, cerrar_meses, gc, uid)
+        if cierre["mes"] is None:
+            await update.message.reply_text("No hay movimientos con fecha para cerrar.")
+            return
+
+        msg = f"Cierre guardado hasta {cierre['mes']} ({cierre['nuevos']} meses cerrados)."
+        if cierre["recalculados"]:
+            msg += f"\nSe recalcularon {cierre['recalculados']} cierres por cambios en meses ya cerrados."
+        await update.message.reply_text(msg)
+
+    except Exception as e:
+        await update.message.reply_text(f"No pude cerrar el mes. Error: {e}")
+
+async def sincronizar(update, context):
+    if not allowed(update):
+        return
+
+    gc = context.application.bot_data["gc"]
+
+    try:
+        uid = update.effective_user.id
+        if not storage_for(uid).remote:
+            await update.message.reply_text("Tus datos se guardan en la base local; no hay copia que sincronizar.")
+            return
+        await run_sheets(uid, resync_user, gc, uid)
+        await update.message.reply_text("Copia local sincronizada con tu Sheet.")
+
+    except Exception as e:
+        await update.message.reply_text(f"No pude sincronizar. Error: {e}")
+
+async def recargar(update, context):
+    if not allowed(update):
+        return
+
+    try:
+        sheet_id = get_sheet_id(update.effective_user.id)
+        invalidate_rates(sheet_id)
+        invalidate_deudas(sheet_id)
+        antes = catalog_version(sheet_id)
+        await ensure_catalogs(update, context, force=True)
+        cambio = "actualizados" if catalog_version(sheet_id) != antes else "sin cambios"
+        await update.message.reply_text(f"Catálogos recargados ({cambio}).")
+
+    except Exception as e:
+        await update.message.reply_text(f"No pude recargar catálogos. Error: {e}")
+
+async def stats(update, context):
+    if not is_admin(update):
+        return
+    for chunk in split_message(render_stats()):
+        await update.message.reply_text(chunk)
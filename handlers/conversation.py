@@ -2,12 +2,14 @@ from datetime import datetime, timedelta
 
 from auth import allowed
 from catalogs import get_accounts_by_role, get_catalogos
-from config import BANCOS, BOLSA_NORMAL, CATEG_EGR, CATEG_ING, CUENTAS, FUENTES_ING, METODOS, PERSONAS_PRESTAMO, TZ
+from config import BANCOS, BOLSA_NORMAL, CATEG_EGR, CATEG_ING, FUENTES_ING, METODOS, PERSONAS_PRESTAMO, TZ
+from debt_cache import load_deudas_snapshot
 from finance import build_deudas
 from helpers import ensure_fecha_text, format_money_q, parse_money_text, parse_positive_int_text
 from keyboards import kb_confirm, kb_cuentas_pago, kb_date, kb_list, kb_mov_direction, kb_mov_type
 from renderers import render_summary
 from services import ejecutar_pago_deuda, save_to_sheets
+from sheets_async import run_sheets
 from state import st_get, st_reset
 from validators import movimientos_misma_ruta, validate_flow_data
 
@@ -245,7 +247,9 @@ async def on_cb(update, context):
         row_num = int(cb.split(":")[1])
 
         gc = context.application.bot_data["gc"]
-        activas = [d for d in build_deudas(gc, update.effective_user.id) if d["estado"].lower() == "activa" and d["pendientes"] > 0]
+        uid = update.effective_user.id
+        snap = await run_sheets(uid, load_deudas_snapshot, gc, uid)
+        activas = [d for d in build_deudas(snap) if d["estado"].lower() == "activa" and d["pendientes"] > 0]
         context.user_data["deudas_activas"] = activas
         deuda = next((d for d in activas if d["row"] == row_num), None)
 
@@ -256,12 +260,9 @@ async def on_cb(update, context):
         st["data"]["deuda_row"] = deuda["row"]
         st["data"]["deuda_nombre"] = deuda["nombre"]
         st["data"]["deuda_cuota"] = deuda["cuota"]
+        st["data"]["deuda_pagados"] = deuda["pagados"]
 
-        cats = get_catalogos(context)
-        cuentas = cats["CUENTAS"] if cats else CUENTAS
-
-        excluir = {"ahorro", "prestamos", "ugly", "binance", "osmo", "hapi"}
-        cuentas_pago = [c for c in cuentas if c.strip().lower() not in excluir]
+        cuentas_pago, _, _ = get_accounts_by_role(context)
 
         st["step"] = "pagar_deuda_cuenta"
         await q.edit_message_text(
@@ -273,15 +274,25 @@ async def on_cb(update, context):
     if cb.startswith("PAGAR_CTA:"):
         cuenta_pago = cb.split(":", 1)[1]
 
+        if "deuda_row" not in st["data"]:
+            await q.edit_message_text("Ese pago ya fue procesado. Usa /pagar para registrar otro.")
+            return
+
         st["data"]["cuenta_pago"] = cuenta_pago
+        st["data"]["pago_key"] = f"{q.message.chat_id}:{q.message.message_id}"
 
         try:
-            await ejecutar_pago_deuda(context, update.effective_user.id, st["data"])
+            registrado = await ejecutar_pago_deuda(context, update.effective_user.id, st["data"])
         except Exception as e:
             st_reset(context)
             await q.edit_message_text(f"No pude registrar el pago. {e}")
             return
 
+        if not registrado:
+            st_reset(context)
+            await q.edit_message_text("Ese pago ya estaba registrado.")
+            return
+
         deuda_nombre = st["data"]["deuda_nombre"]
         cuota = st["data"]["deuda_cuota"]
 
@@ -295,6 +306,9 @@ async def on_cb(update, context):
         return
 
     if cb == "CONFIRM:SAVE":
+        if st["step"] != "confirm":
+            await q.edit_message_text("Ese registro ya se guardó o se canceló.")
+            return
         try:
             validate_flow_data(data)
             await save_to_sheets(context, data, update.effective_user.id)
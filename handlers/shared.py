@@ -1,10 +1,13 @@
-from catalogs import load_catalogos
 from config import CUENTAS
-from sheets_service import get_sheet_for_user
+from sheets_async import run_sheets
+from storage import storage_for
 
-async def ensure_catalogs(update, context):
+def load_catalogos_for_user(gc, uid: int, force: bool = False):
+    return storage_for(uid).read_catalog(gc, uid, force=force)
+
+async def ensure_catalogs(update, context, force: bool = False):
     gc = context.application.bot_data["gc"]
-    sh = get_sheet_for_user(gc, update.effective_user.id)
-    cats = load_catalogos(sh)
+    uid = update.effective_user.id
+    cats = await run_sheets(uid, load_catalogos_for_user, gc, uid, force=force)
     context.user_data["catalogos"] = cats
     context.user_data["cuentas"] = cats.get("CUENTAS") or CUENTAS
@@ -1,12 +1,14 @@
 import re
 import unicodedata
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 
 def norm(s: str) -> str:
     s = str(s).strip().lower()
     s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
     return s
 
+@lru_cache(maxsize=8192)
 def norm_key(s: str) -> str:
     return norm(s)
 
@@ -95,6 +97,75 @@ def week_range(today: date):
     start = today - timedelta(days=today.weekday())
     return start, start + timedelta(days=7)
 
+GRANULARIDADES = {
+    "dia": "dia", "día": "dia", "dias": "dia", "días": "dia",
+    "semana": "semana", "semanas": "semana",
+    "mes": "mes", "meses": "mes",
+    "anio": "anio", "año": "anio", "anios": "anio", "años": "anio",
+}
+
+def period_start(d: date, granularidad: str) -> date:
+    if granularidad == "dia":
+        return d
+    if granularidad == "semana":
+        return d - timedelta(days=d.weekday())
+    if granularidad == "mes":
+        return d.replace(day=1)
+    return date(d.year, 1, 1)
+
+def period_end(start: date, granularidad: str) -> date:
+    if granularidad == "dia":
+        return start + timedelta(days=1)
+    if granularidad == "semana":
+        return start + timedelta(days=7)
+    if granularidad == "mes":
+        return month_range(start)[1]
+    return date(start.year + 1, 1, 1)
+
+def period_label(start: date, granularidad: str) -> str:
+    if granularidad == "semana":
+        return f"Semana {start}"
+    if granularidad == "mes":
+        return start.strftime("%Y-%m")
+    if granularidad == "anio":
+        return str(start.year)
+    return str(start)
+
+def parse_periodo(txt: str):
+    s = txt.strip()
+    if re.fullmatch(r"\d{4}", s):
+        start = date(int(s), 1, 1)
+        return start, period_end(start, "anio")
+    if re.fullmatch(r"\d{4}-\d{1,2}", s):
+        y, m = s.split("-")
+        start = date(int(y), int(m), 1)
+        return start, period_end(start, "mes")
+    f = parse_fecha(s)
+    if not f:
+        raise ValueError(f"Periodo inválido: {txt}. Usa YYYY, YYYY-MM o YYYY-MM-DD.")
+    return f, f + timedelta(days=1)
+
+def parse_rango_resumen(args: list[str]):
+    if not args:
+        return None, None
+    if len(args) > 2:
+        raise ValueError("Uso: /resumen [desde..hasta] [dia|semana|mes|año]")
+
+    partes = args[0].split("..")
+    if len(partes) > 2:
+        raise ValueError("Rango inválido. Ejemplo: 2026-01..2026-06")
+    start, _ = parse_periodo(partes[0])
+    _, end = parse_periodo(partes[-1])
+    if end <= start:
+        raise ValueError("El rango debe terminar después de empezar.")
+
+    granularidad = None
+    if len(args) == 2:
+        granularidad = GRANULARIDADES.get(args[1].strip().lower())
+        if not granularidad:
+            raise ValueError("Granularidad inválida. Usa dia, semana, mes o año.")
+    return (start, end), granularidad
+
 def format_money_q(value: float) -> str:
     return f"Q {value:,.2f}"
 
@@ -1,32 +1,93 @@
+import logging
 from datetime import datetime, timedelta
 
-from config import TZ, USER_SHEETS
+from balances import cerrar_meses
+from config import SHEET_EGRESOS, SHEET_INGRESOS, TZ, USER_SHEETS
+from fanout import fan_out, send_text
 from finance import build_resumen_mes, build_resumen_semana
+from quota import mark_background
+from sheets_async import run_sheets
+from sheets_service import get_sheet_id, write_version
+from snapshot import load_snapshot
+
+logger = logging.getLogger(__name__)
+
+PREWARM_MAX_AGE = timedelta(hours=2)
+
+_prewarmed: dict[tuple[str, int], dict] = {}
 
 def is_last_day_of_month(d):
     return (d + timedelta(days=1)).day == 1
 
-async def job_resumen_semanal(context):
+def job_users() -> list[int]:
+    return [int(uid_str) for uid_str in USER_SHEETS.keys()]
+
+async def resumen_usuario(gc, uid: int, builder) -> str:
+    snap = await run_sheets(uid, load_snapshot, gc, uid, tabs=(SHEET_INGRESOS, SHEET_EGRESOS))
+    return builder(snap)
+
+async def precalcular(gc, uid: int, nombre: str, builder) -> str:
+    version = write_version(get_sheet_id(uid))
+    txt = await resumen_usuario(gc, uid, builder)
+    _prewarmed[(nombre, uid)] = {"txt": txt, "version": version, "at": datetime.now(TZ)}
+    return txt
+
+def precalculado(nombre: str, uid: int):
+    entry = _prewarmed.pop((nombre, uid), None)
+    if entry is None:
+        return None
+    if entry["version"] != write_version(get_sheet_id(uid)):
+        return None
+    if datetime.now(TZ) - entry["at"] > PREWARM_MAX_AGE:
+        return None
+    return entry["txt"]
+
+async def resumen_para_envio(gc, uid: int, nombre: str, builder, hits: list) -> str:
+    txt = precalculado(nombre, uid)
+    if txt is not None:
+        hits.append(uid)
+        return txt
+    return await resumen_usuario(gc, uid, builder)
+
+async def enviar_resumen(context, nombre: str, builder, prefijo: str = ""):
+    mark_background()
     gc = context.application.bot_data["gc"]
     bot = context.bot
-    for uid_str in USER_SHEETS.keys():
-        uid = int(uid_str)
-        try:
-            txt = build_resumen_semana(gc, uid)
-            await bot.send_message(chat_id=uid, text=txt)
-        except Exception:
-            pass
+    hits = []
+    uids = job_users()
+    await fan_out(
+        nombre,
+        uids,
+        lambda uid: resumen_para_envio(gc, uid, nombre, builder, hits),
+        lambda uid, txt, stats: send_text(bot, uid, f"{prefijo}{txt}", stats),
+    )
+    logger.info("%s: %d de %d usuarios con resumen precalculado", nombre, len(hits), len(uids))
+
+async def precalcular_resumen(context, nombre: str, builder):
+    mark_background()
+    gc = context.application.bot_data["gc"]
+    await fan_out(f"precalculo_{nombre}", job_users(), lambda uid: precalcular(gc, uid, nombre, builder))
+
+async def job_precalculo_semanal(context):
+    await precalcular_resumen(context, "resumen_semanal", build_resumen_semana)
+
+async def job_resumen_semanal(context):
+    await enviar_resumen(context, "resumen_semanal", build_resumen_semana)
+
+async def job_precalculo_fin_de_mes(context):
+    if not is_last_day_of_month(datetime.now(TZ).date()):
+        return
+    await precalcular_resumen(context, "resumen_fin_de_mes", build_resumen_mes)
 
 async def job_resumen_fin_de_mes(context):
     hoy = datetime.now(TZ).date()
     if not is_last_day_of_month(hoy):
         return
+    await enviar_resumen(context, "resumen_fin_de_mes", build_resumen_mes, "Fin de mes:\n\n")
+
+async def job_cierre_mes(context):
+    if datetime.now(TZ).day != 1:
+        return
+    mark_background()
     gc = context.application.bot_data["gc"]
-    bot = context.bot
-    for uid_str in USER_SHEETS.keys():
-        uid = int(uid_str)
-        try:
-            txt = build_resumen_mes(gc, uid)
-            await bot.send_message(chat_id=uid, text=f"Fin de mes:\n\n{txt}")
-        except Exception:
-            pass
+    await fan_out("cierre_mes", job_users(), lambda uid: run_sheets(uid, cerrar_meses, gc, uid))
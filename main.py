@@ -9,10 +9,25 @@ from telegram.ext import (
     filters,
 )
 
-from config import BOT_TOKEN, TZ
+from config import (
+    BOT_MODE,
+    BOT_TOKEN,
+    METRICS_PORT,
+    PREWARM_MINUTES,
+    STATE_FLUSH_SECONDS,
+    TZ,
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    WRITE_FLUSH_SECONDS,
+)
 from handlers.commands import (
     ahorro,
     cancelar,
+    cerrar_mes,
     deudas,
     deudas_activas,
     neto,
@@ -20,57 +35,139 @@ from handlers.commands import (
     nueva_deuda,
     nuevo,
     pagar,
+    recargar,
     resumen,
     saldos,
+    sincronizar,
     start,
+    stats,
     whoami,
 )
 from handlers.conversation import on_cb, on_text
-from jobs import job_resumen_fin_de_mes, job_resumen_semanal
+from jobs import (
+    job_cierre_mes,
+    job_precalculo_fin_de_mes,
+    job_precalculo_semanal,
+    job_resumen_fin_de_mes,
+    job_resumen_semanal,
+)
+from metrics import instrument, serve_metrics
+from persistence import SQLitePersistence, job_flush_state
+from sheets_async import PerUserUpdateProcessor
 from sheets_service import gs_client
+from write_queue import flush_all, job_flush_writes
 
 logger = logging.getLogger(__name__)
 
 async def error_handler(update, context):
     logger.exception("Exception while handling an update:", exc_info=context.error)
 
+async def on_shutdown(app):
+    await flush_all(app.bot_data["gc"])
+
+def command(name: str, fn):
+    return CommandHandler(name, instrument(name, fn))
+
+def run(app):
+    if BOT_MODE != "webhook":
+        app.run_polling()
+        return
+
+    url = f"{WEBHOOK_URL}/{WEBHOOK_PATH}"
+    app.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=url,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
 def main():
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s", level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
     gc = gs_client()
-    app = Application.builder().token(BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor())
+        .persistence(SQLitePersistence())
+        .post_shutdown(on_shutdown)
+        .build()
+    )
 
     app.bot_data["gc"] = gc
 
+    app.job_queue.run_repeating(
+        instrument("cola_de_escritura", job_flush_writes),
+        interval=WRITE_FLUSH_SECONDS,
+        first=0,
+        name="cola_de_escritura",
+    )
+    app.job_queue.run_repeating(
+        instrument("estado_usuarios", job_flush_state),
+        interval=STATE_FLUSH_SECONDS,
+        first=STATE_FLUSH_SECONDS,
+        name="estado_usuarios",
+    )
     app.job_queue.run_daily(
-        job_resumen_semanal,
+        instrument("resumen_semanal_dom_2100", job_resumen_semanal),
         time=dtime(hour=21, minute=0, tzinfo=TZ),
         days=(6,),
         name="resumen_semanal_dom_2100",
     )
     app.job_queue.run_daily(
-        job_resumen_fin_de_mes,
+        instrument("resumen_fin_de_mes_ultimo_dia_2100", job_resumen_fin_de_mes),
         time=dtime(hour=21, minute=0, tzinfo=TZ),
         name="resumen_fin_de_mes_ultimo_dia_2100",
     )
+    app.job_queue.run_daily(
+        instrument("cierre_mes_primer_dia_0030", job_cierre_mes),
+        time=dtime(hour=0, minute=30, tzinfo=TZ),
+        name="cierre_mes_primer_dia_0030",
+    )
+
+    if PREWARM_MINUTES > 0:
+        minutos = 21 * 60 - PREWARM_MINUTES
+        precalculo = dtime(hour=minutos // 60, minute=minutos % 60, tzinfo=TZ)
+        app.job_queue.run_daily(
+            instrument("precalculo_resumen_semanal", job_precalculo_semanal),
+            time=precalculo,
+            days=(6,),
+            name="precalculo_resumen_semanal",
+        )
+        app.job_queue.run_daily(
+            instrument("precalculo_resumen_fin_de_mes", job_precalculo_fin_de_mes),
+            time=precalculo,
+            name="precalculo_resumen_fin_de_mes",
+        )
+
+    app.add_handler(command("start", start))
+    app.add_handler(command("nuevo", nuevo))
+    app.add_handler(command("nueva_deuda", nueva_deuda))
+    app.add_handler(command("cancelar", cancelar))
+    app.add_handler(command("whoami", whoami))
+    app.add_handler(command("resumen", resumen))
+    app.add_handler(command("saldos", saldos))
+    app.add_handler(command("ahorro", ahorro))
+    app.add_handler(command("networth", networth))
+    app.add_handler(command("deudas", deudas))
+    app.add_handler(command("deudas_activas", deudas_activas))
+    app.add_handler(command("pagar", pagar))
+    app.add_handler(command("neto", neto))
+    app.add_handler(command("cerrar_mes", cerrar_mes))
+    app.add_handler(command("sincronizar", sincronizar))
+    app.add_handler(command("recargar", recargar))
+    app.add_handler(command("stats", stats))
+
+    app.add_handler(CallbackQueryHandler(instrument("callback", on_cb)))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument("texto", on_text)))
+
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
 
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("nuevo", nuevo))
-    app.add_handler(CommandHandler("nueva_deuda", nueva_deuda))
-    app.add_handler(CommandHandler("cancelar", cancelar))
-    app.add_handler(CommandHandler("whoami", whoami))
-    app.add_handler(CommandHandler("resumen", resumen))
-    app.add_handler(CommandHandler("saldos", saldos))
-    app.add_handler(CommandHandler("ahorro", ahorro))
-    app.add_handler(CommandHandler("networth", networth))
-    app.add_handler(CommandHandler("deudas", deudas))
-    app.add_handler(CommandHandler("deudas_activas", deudas_activas))
-    app.add_handler(CommandHandler("pagar", pagar))
-    app.add_handler(CommandHandler("neto", neto))
-
-    app.add_handler(CallbackQueryHandler(on_cb))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_text))
-
-    print("Bot finanzas encendido...")
-    app.run_polling(drop_pending_updates=True)
+    print(f"Bot finanzas encendido ({BOT_MODE})...")
+    run(app)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+import contextvars
+import functools
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_WINDOW
+
+logger = logging.getLogger(__name__)
+
+SERIES = {
+    "wall_s": ("command_seconds", "Tiempo total del comando o tarea"),
+    "sheets_s": ("command_sheets_seconds", "Tiempo dentro de llamadas a Sheets, con la espera de cuota"),
+    "calls": ("command_sheets_calls", "Llamadas a la API de Sheets"),
+    "rows": ("command_rows_scanned", "Filas recorridas"),
+    "bytes": ("command_bytes_read", "Bytes recibidos de Sheets"),
+}
+QUANTILES = (0.5, 0.95, 0.99)
+RANGE_TAB = re.compile(r"^'?(.+?)'?!")
+
+_current = contextvars.ContextVar("metrics_record", default=None)
+_lock = threading.Lock()
+_samples: dict[str, dict[str, deque]] = {}
+_totals: dict[str, dict[str, float]] = {}
+_tab_calls: dict[str, dict[str, int]] = {}
+
+def new_record() -> dict:
+    return {"sheets_s": 0.0, "calls": 0, "rows": 0, "bytes": 0, "tabs": {}}
+
+def call_tabs(fn, args) -> list[str]:
+    owner = getattr(fn, "__self__", None)
+    if owner is not None and hasattr(owner, "title") and hasattr(owner, "spreadsheet"):
+        return [owner.title]
+    if args and isinstance(args[0], (list, tuple)):
+        tabs = [m.group(1) for m in (RANGE_TAB.match(r) for r in args[0] if isinstance(r, str)) if m]
+        if tabs:
+            return list(dict.fromkeys(tabs))
+    return [getattr(fn, "__name__", "otro")]
+
+def record_sheets_call(fn, args, seconds: float):
+    rec = _current.get()
+    if rec is None:
+        return
+    with _lock:
+        rec["sheets_s"] += seconds
+        rec["calls"] += 1
+        for tab in call_tabs(fn, args):
+            rec["tabs"][tab] = rec["tabs"].get(tab, 0) + 1
+
+def add_rows(n: int):
+    rec = _current.get()
+    if rec is not None and n:
+        with _lock:
+            rec["rows"] += n
+
+def on_response(response, *args, **kwargs):
+    rec = _current.get()
+    if rec is not None:
+        with _lock:
+            rec["bytes"] += len(response.content or b"")
+    return response
+
+def observe(name: str, rec: dict, wall_s: float):
+    values = {"wall_s": wall_s, **{k: rec[k] for k in SERIES if k != "wall_s"}}
+    with _lock:
+        samples = _samples.setdefault(name, {k: deque(maxlen=METRICS_WINDOW) for k in SERIES})
+        totals = _totals.setdefault(name, {"count": 0, **{k: 0.0 for k in SERIES}})
+        tabs = _tab_calls.setdefault(name, {})
+        totals["count"] += 1
+        for k, v in values.items():
+            samples[k].append(v)
+            totals[k] += v
+        for tab, n in rec["tabs"].items():
+            tabs[tab] = tabs.get(tab, 0) + n
+
+def instrument(name: str, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        rec = new_record()
+        token = _current.set(rec)
+        t0 = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            observe(name, rec, time.perf_counter() - t0)
+    return wrapper
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+def snapshot_stats() -> dict[str, dict]:
+    with _lock:
+        out = {}
+        for name, samples in _samples.items():
+            out[name] = {
+                "count": _totals[name]["count"],
+                "totals": dict(_totals[name]),
+                "tabs": dict(_tab_calls.get(name, {})),
+                "quantiles": {
+                    k: {q: percentile(sorted(s), q) for q in QUANTILES} for k, s in samples.items()
+                },
+            }
+    return out
+
+def render_stats() -> str:
+    stats = snapshot_stats()
+    if not stats:
+        return "Sin métricas todavía."
+    lines = [f"Estadísticas (últimas {METRICS_WINDOW} ejecuciones por comando)"]
+    for name in sorted(stats, key=lambda n: -stats[n]["quantiles"]["wall_s"][0.95]):
+        s = stats[name]
+        q = s["quantiles"]
+        tabs = ", ".join(f"{t}={n}" for t, n in sorted(s["tabs"].items(), key=lambda x: -x[1])[:4])
+        lines.append(
+            f"\n{name} (n={s['count']})\n"
+            f"- total ms p50/p95/p99: {q['wall_s'][0.5] * 1000:.0f} / {q['wall_s'][0.95] * 1000:.0f} / {q['wall_s'][0.99] * 1000:.0f}\n"
+            f"- Sheets ms p50/p95/p99: {q['sheets_s'][0.5] * 1000:.0f} / {q['sheets_s'][0.95] * 1000:.0f} / {q['sheets_s'][0.99] * 1000:.0f}\n"
+            f"- llamadas p50/p95: {q['calls'][0.5]:.0f} / {q['calls'][0.95]:.0f}"
+            f" | filas p95: {q['rows'][0.95]:.0f} | KB p95: {q['bytes'][0.95] / 1024:.1f}"
+            + (f"\n- por hoja: {tabs}" if tabs else "")
+        )
+    return "\n".join(lines)
+
+def label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus() -> str:
+    stats = snapshot_stats()
+    lines = []
+    for key, (metric, ayuda) in SERIES.items():
+        full = f"botfinanzas_{metric}"
+        lines.append(f"# HELP {full} {ayuda}")
+        lines.append(f"# TYPE {full} summary")
+        for name, s in sorted(stats.items()):
+            cmd = label(name)
+            for q in QUANTILES:
+                lines.append(f'{full}{{command="{cmd}",quantile="{q}"}} {s["quantiles"][key][q]:.6g}')
+            lines.append(f'{full}_sum{{command="{cmd}"}} {s["totals"][key]:.6g}')
+            lines.append(f'{full}_count{{command="{cmd}"}} {s["count"]}')
+    lines.append("# HELP botfinanzas_sheets_calls_total Llamadas a Sheets por comando y hoja")
+    lines.append("# TYPE botfinanzas_sheets_calls_total counter")
+    for name, s in sorted(stats.items()):
+        for tab, n in sorted(s["tabs"].items()):
+            lines.append(f'botfinanzas_sheets_calls_total{{command="{label(name)}",tab="{label(tab)}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Métricas Prometheus en http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,31 @@
+import sys
+
+from gspread.exceptions import WorksheetNotFound
+
+from config import SHEET_TIPO_CAMBIO
+from fx import FX_RANGE
+from sheets_service import gs_client
+from snapshot import LEDGER_RANGES
+from sqlite_store import import_tables, is_sqlite_key
+
+def main():
+    if len(sys.argv) != 3 or not is_sqlite_key(sys.argv[2]):
+        print("Uso: python migrar_sqlite.py <sheet_id> sqlite:<nombre>")
+        sys.exit(2)
+    sheet_id, key = sys.argv[1], sys.argv[2]
+
+    sh = gs_client().open_by_key(sheet_id)
+    tabs = list(LEDGER_RANGES)
+    res = sh.values_batch_get([f"'{t}'!{LEDGER_RANGES[t]}" for t in tabs])
+    tables = {t: vr.get("values", []) for t, vr in zip(tabs, res.get("valueRanges", []))}
+    try:
+        tables[SHEET_TIPO_CAMBIO] = sh.worksheet(SHEET_TIPO_CAMBIO).get(FX_RANGE)
+    except WorksheetNotFound:
+        pass
+
+    for tab, n in import_tables(key, tables).items():
+        print(f"{tab}: {n} filas")
+    print(f'Listo. Usa "{key}" como valor del usuario en USER_SHEETS.')
+
+if __name__ == "__main__":
+    main()
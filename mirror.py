@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from config import DATA_DIR, LEDGER_MIRROR, SHEET_EGRESOS, SHEET_INGRESOS, SHEET_MOVIMIENTOS
+from helpers import parse_fecha
+from quota import sheets_read
+from sheet_utils import build_header_map, column_index
+from sheets_service import get_sheet_for_user, invalidate_on_error
+from snapshot import LEDGER_RANGES, LedgerSnapshot, make_table
+
+MIRRORED_TABS = (SHEET_INGRESOS, SHEET_EGRESOS, SHEET_MOVIMIENTOS)
+MIRROR_PATH = os.path.join(DATA_DIR, "mirror.sqlite3")
+
+_locks: dict[str, threading.Lock] = {}
+_generations: dict[tuple[str, str], int] = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(sheet_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(sheet_id, threading.Lock())
+
+def connect():
+    os.makedirs(os.path.dirname(MIRROR_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(MIRROR_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS mirror_rows ("
+        " sheet_id TEXT NOT NULL, tab TEXT NOT NULL, row_num INTEGER NOT NULL, valores TEXT NOT NULL,"
+        " fecha_ord INTEGER, PRIMARY KEY (sheet_id, tab, row_num))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS mirror_state ("
+        " sheet_id TEXT NOT NULL, tab TEXT NOT NULL, row_count INTEGER NOT NULL, synced_at REAL NOT NULL,"
+        " PRIMARY KEY (sheet_id, tab))"
+    )
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(mirror_rows)")}
+    if "fecha_ord" not in cols:
+        conn.execute("DELETE FROM mirror_rows")
+        conn.execute("DELETE FROM mirror_state")
+        conn.execute("ALTER TABLE mirror_rows ADD COLUMN fecha_ord INTEGER")
+        conn.commit()
+    conn.execute("CREATE INDEX IF NOT EXISTS mirror_rows_fecha ON mirror_rows (sheet_id, tab, fecha_ord)")
+    return conn
+
+def clean_row(row) -> list[str]:
+    out = ["" if v is None else str(v) for v in row]
+    while out and out[-1] == "":
+        out.pop()
+    return out
+
+def last_col(tab: str) -> str:
+    return LEDGER_RANGES[tab].split(":")[1]
+
+def row_counts(conn, sheet_id: str) -> dict[str, int]:
+    cur = conn.execute("SELECT tab, row_count FROM mirror_state WHERE sheet_id = ?", (sheet_id,))
+    return dict(cur.fetchall())
+
+def last_row(conn, sheet_id: str, tab: str, row_num: int):
+    cur = conn.execute(
+        "SELECT valores FROM mirror_rows WHERE sheet_id = ? AND tab = ? AND row_num = ?",
+        (sheet_id, tab, row_num),
+    )
+    hit = cur.fetchone()
+    return json.loads(hit[0]) if hit else None
+
+def fecha_col(conn, sheet_id: str, tab: str, first_row: int, rows: list) -> int:
+    head = rows[0] if first_row == 1 and rows else last_row(conn, sheet_id, tab, 1) or []
+    idx = column_index(build_header_map([head]), "FECHA", "Fecha")
+    return 0 if idx is None else idx
+
+def fecha_ord(row, idx: int):
+    f = parse_fecha(row[idx]) if idx < len(row) else None
+    return f.toordinal() if f else None
+
+def store_rows(conn, sheet_id: str, tab: str, first_row: int, rows: list):
+    idx = fecha_col(conn, sheet_id, tab, first_row, rows)
+    conn.executemany(
+        "INSERT OR REPLACE INTO mirror_rows (sheet_id, tab, row_num, valores, fecha_ord) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                sheet_id, tab, first_row + i, json.dumps(clean_row(r), ensure_ascii=False),
+                fecha_ord(r, idx) if first_row + i > 1 else None,
+            )
+            for i, r in enumerate(rows)
+        ],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO mirror_state (sheet_id, tab, row_count, synced_at) VALUES (?, ?, ?, ?)",
+        (sheet_id, tab, first_row + len(rows) - 1, time.time()),
+    )
+
+def drop_tab(conn, sheet_id: str, tab: str):
+    _generations[(sheet_id, tab)] = generation(sheet_id, tab) + 1
+    conn.execute("DELETE FROM mirror_rows WHERE sheet_id = ? AND tab = ?", (sheet_id, tab))
+    conn.execute("DELETE FROM mirror_state WHERE sheet_id = ? AND tab = ?", (sheet_id, tab))
+
+def reload_tab(conn, sheet_id: str, tab: str, values: list):
+    drop_tab(conn, sheet_id, tab)
+    if values:
+        store_rows(conn, sheet_id, tab, 1, values)
+
+def read_tab(conn, sheet_id: str, tab: str, rango=None) -> list[list[str]]:
+    if rango:
+        cur = conn.execute(
+            "SELECT valores FROM mirror_rows WHERE sheet_id = ? AND tab = ?"
+            " AND (row_num = 1 OR (fecha_ord >= ? AND fecha_ord < ?)) ORDER BY row_num",
+            (sheet_id, tab, rango[0].toordinal(), rango[1].toordinal()),
+        )
+    else:
+        cur = conn.execute(
+            "SELECT valores FROM mirror_rows WHERE sheet_id = ? AND tab = ? ORDER BY row_num",
+            (sheet_id, tab),
+        )
+    return [json.loads(v) for (v,) in cur]
+
+def sync_ranges(counts: dict[str, int], tabs: list[str]) -> list[str]:
+    ranges = []
+    for t in tabs:
+        start = counts.get(t, 0) if t in MIRRORED_TABS else 0
+        ranges.append(f"'{t}'!A{max(start, 1)}:{last_col(t)}")
+    return ranges
+
+def sync_mirror(gc, uid: int, tabs=None) -> tuple[str, dict[str, int], dict]:
+    tabs = list(tabs or LEDGER_RANGES)
+    sh = get_sheet_for_user(gc, uid)
+
+    with _lock_for(sh.id):
+        conn = connect()
+        try:
+            counts = row_counts(conn, sh.id)
+            with invalidate_on_error(sh.id):
+                res = sheets_read(sh.values_batch_get, sync_ranges(counts, tabs))
+
+            fresh = {}
+            stale = []
+            for t, vr in zip(tabs, res.get("valueRanges", [])):
+                values = vr.get("values", [])
+                if t not in MIRRORED_TABS:
+                    fresh[t] = make_table(values)
+                    continue
+
+                count = counts.get(t, 0)
+                if count == 0:
+                    reload_tab(conn, sh.id, t, values)
+                elif not values or clean_row(values[0]) != last_row(conn, sh.id, t, count):
+                    stale.append(t)
+                elif len(values) > 1:
+                    store_rows(conn, sh.id, t, count + 1, values[1:])
+
+            if stale:
+                with invalidate_on_error(sh.id):
+                    res = sheets_read(sh.values_batch_get, [f"'{t}'!{LEDGER_RANGES[t]}" for t in stale])
+                for t, vr in zip(stale, res.get("valueRanges", [])):
+                    reload_tab(conn, sh.id, t, vr.get("values", []))
+
+            conn.commit()
+            counts = row_counts(conn, sh.id)
+        finally:
+            conn.close()
+
+    return sh.id, {t: counts.get(t, 0) for t in tabs if t in MIRRORED_TABS}, fresh
+
+def load_mirrored_snapshot(gc, uid: int, tabs=None, rango=None) -> LedgerSnapshot:
+    sheet_id, counts, tables = sync_mirror(gc, uid, tabs)
+
+    generations = {}
+    conn = connect()
+    try:
+        for t in counts:
+            gen = generation(sheet_id, t)
+            tables[t] = make_table(read_tab(conn, sheet_id, t, rango))
+            if rango is None and gen == generation(sheet_id, t):
+                generations[t] = gen
+    finally:
+        conn.close()
+
+    return LedgerSnapshot(tables=tables, sheet_id=sheet_id, generations=generations)
+
+def read_rows(sheet_id: str, tab: str, first_row: int, last_row_num: int) -> list[list[str]]:
+    conn = connect()
+    try:
+        cur = conn.execute(
+            "SELECT valores FROM mirror_rows WHERE sheet_id = ? AND tab = ? AND row_num BETWEEN ? AND ? ORDER BY row_num",
+            (sheet_id, tab, first_row, last_row_num),
+        )
+        return [json.loads(v) for (v,) in cur]
+    finally:
+        conn.close()
+
+def generation(sheet_id: str, tab: str) -> int:
+    return _generations.get((sheet_id, tab), 0)
+
+def appended_rows(response):
+    if not isinstance(response, dict):
+        return None
+    updates = response.get("updates") or {}
+    m = re.search(r"!\$?[A-Z]+\$?(\d+)", updates.get("updatedRange", ""))
+    values = (updates.get("updatedData") or {}).get("values")
+    if not m or not values:
+        return None
+    return int(m.group(1)), values
+
+def record_append(sheet_id: str, tab: str, response):
+    appended = appended_rows(response)
+    if not LEDGER_MIRROR or tab not in MIRRORED_TABS or not appended:
+        return
+
+    first_row, values = appended
+    with _lock_for(sheet_id):
+        conn = connect()
+        try:
+            count = row_counts(conn, sheet_id).get(tab, 0)
+            if count and first_row == count + 1:
+                store_rows(conn, sheet_id, tab, first_row, values)
+            elif count:
+                drop_tab(conn, sheet_id, tab)
+            conn.commit()
+        finally:
+            conn.close()
+
+def reset_mirror(sheet_id: str):
+    with _lock_for(sheet_id):
+        conn = connect()
+        try:
+            for t in MIRRORED_TABS:
+                drop_tab(conn, sheet_id, t)
+            conn.commit()
+        finally:
+            conn.close()
+
+def resync_user(gc, uid: int) -> LedgerSnapshot:
+    sh = get_sheet_for_user(gc, uid)
+    reset_mirror(sh.id)
+    return load_mirrored_snapshot(gc, uid)
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import DATA_DIR, STATE_FLUSH_SECONDS
+
+STATE_PATH = os.path.join(DATA_DIR, "state.sqlite3")
+
+def connect():
+    os.makedirs(os.path.dirname(STATE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(STATE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS user_state ("
+        " user_id INTEGER PRIMARY KEY, datos BLOB NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS catalog_state ("
+        " sheet_id TEXT PRIMARY KEY, valores BLOB NOT NULL, saved_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cierres ("
+        " sheet_id TEXT NOT NULL, mes TEXT NOT NULL, huella INTEGER NOT NULL, reglas TEXT NOT NULL,"
+        " tasas TEXT NOT NULL, saldos BLOB NOT NULL, cerrado_at REAL NOT NULL, PRIMARY KEY (sheet_id, mes))"
+    )
+    return conn
+
+def pack(data) -> bytes:
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+
+def unpack(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def read_user_state(user_id: int):
+    conn = connect()
+    try:
+        hit = conn.execute("SELECT datos FROM user_state WHERE user_id = ?", (user_id,)).fetchone()
+        return unpack(hit[0]) if hit else None
+    finally:
+        conn.close()
+
+def write_user_states(items: list[tuple[int, bytes]]):
+    conn = connect()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO user_state (user_id, datos, updated_at) VALUES (?, ?, ?)",
+                [(uid, blob, time.time()) for uid, blob in items],
+            )
+    finally:
+        conn.close()
+
+def delete_user_state(user_id: int):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM user_state WHERE user_id = ?", (user_id,))
+    finally:
+        conn.close()
+
+def save_catalog_values(sheet_id: str, values: list[list[str]]):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_state (sheet_id, valores, saved_at) VALUES (?, ?, ?)",
+                (sheet_id, pack(values), time.time()),
+            )
+    finally:
+        conn.close()
+
+def load_catalog_values(sheet_id: str):
+    conn = connect()
+    try:
+        hit = conn.execute("SELECT valores, saved_at FROM catalog_state WHERE sheet_id = ?", (sheet_id,)).fetchone()
+        return (unpack(hit[0]), hit[1]) if hit else None
+    finally:
+        conn.close()
+
+def load_cierres(sheet_id: str) -> list[dict]:
+    conn = connect()
+    try:
+        cur = conn.execute(
+            "SELECT mes, huella, reglas, tasas, saldos FROM cierres WHERE sheet_id = ? ORDER BY mes",
+            (sheet_id,),
+        )
+        return [{"mes": m, "huella": h, "reglas": r, "tasas": t, "saldos": b} for m, h, r, t, b in cur]
+    finally:
+        conn.close()
+
+def save_cierres(sheet_id: str, desde, items: list[dict]):
+    conn = connect()
+    try:
+        with conn:
+            if desde is not None:
+                conn.execute("DELETE FROM cierres WHERE sheet_id = ? AND mes >= ?", (sheet_id, desde))
+            conn.executemany(
+                "INSERT OR REPLACE INTO cierres (sheet_id, mes, huella, reglas, tasas, saldos, cerrado_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(sheet_id, c["mes"], c["huella"], c["reglas"], c["tasas"], c["saldos"], time.time()) for c in items],
+            )
+    finally:
+        conn.close()
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, update_interval: float = STATE_FLUSH_SECONDS):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded: set[int] = set()
+        self._written: dict[int, bytes] = {}
+        self._dirty: dict[int, bytes] = {}
+        self._lock = asyncio.Lock()
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+        stored = await asyncio.to_thread(read_user_state, user_id)
+        if stored:
+            for k, v in stored.items():
+                user_data.setdefault(k, v)
+            self._written[user_id] = pack(stored)
+
+    async def update_user_data(self, user_id: int, data: dict):
+        blob = pack(data)
+        if self._written.get(user_id) == blob:
+            self._dirty.pop(user_id, None)
+            return
+        self._dirty[user_id] = blob
+
+    async def flush_dirty(self):
+        async with self._lock:
+            items = list(self._dirty.items())
+            if not items:
+                return
+            await asyncio.to_thread(write_user_states, items)
+            for uid, blob in items:
+                self._written[uid] = blob
+                if self._dirty.get(uid) is blob:
+                    del self._dirty[uid]
+
+    async def drop_user_data(self, user_id: int):
+        self._dirty.pop(user_id, None)
+        self._written.pop(user_id, None)
+        await asyncio.to_thread(delete_user_state, user_id)
+
+    async def flush(self):
+        await self.flush_dirty()
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
+
+async def job_flush_state(context):
+    await context.application.persistence.flush_dirty()
@@ -0,0 +1,93 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from gspread.exceptions import APIError
+
+from config import SHEETS_MAX_RETRIES, SHEETS_READS_PER_MINUTE, SHEETS_WRITES_PER_MINUTE
+from metrics import record_sheets_call
+
+logger = logging.getLogger(__name__)
+
+READ_RETRY_CODES = {429, 500, 502, 503, 504}
+WRITE_RETRY_CODES = {429}
+BACKGROUND_RESERVE = 0.25
+MAX_BACKOFF = 32.0
+
+_background = contextvars.ContextVar("sheets_background", default=False)
+
+def mark_background():
+    _background.set(True)
+
+def is_background() -> bool:
+    return _background.get()
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, float(per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.interactive_waiting = 0
+        self.cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, background: bool = False) -> float:
+        t0 = time.monotonic()
+        floor = self.capacity * BACKGROUND_RESERVE if background else 0.0
+        with self.cond:
+            if not background:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    blocked = background and self.interactive_waiting > 0
+                    if not blocked and self.tokens >= floor + 1:
+                        self.tokens -= 1
+                        return time.monotonic() - t0
+                    wait = max(floor + 1 - self.tokens, 0.0) / self.rate
+                    self.cond.wait(timeout=max(wait, 0.05))
+            finally:
+                if not background:
+                    self.interactive_waiting -= 1
+                    self.cond.notify_all()
+
+_buckets = {
+    "read": TokenBucket(SHEETS_READS_PER_MINUTE),
+    "write": TokenBucket(SHEETS_WRITES_PER_MINUTE),
+}
+
+def retry_delay(attempt: int) -> float:
+    return min(MAX_BACKOFF, 2.0 ** attempt) * (0.5 + random.random())
+
+def sheets_call(kind: str, fn, *args, **kwargs):
+    background = is_background()
+    codes = READ_RETRY_CODES if kind == "read" else WRITE_RETRY_CODES
+    t0 = time.perf_counter()
+    try:
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            waited = _buckets[kind].acquire(background)
+            if waited > 1:
+                logger.info("Cuota de Sheets (%s): esperé %.1fs", kind, waited)
+            try:
+                return fn(*args, **kwargs)
+            except APIError as e:
+                if attempt == SHEETS_MAX_RETRIES or e.code not in codes:
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning("Sheets respondió %s (%s); reintento en %.1fs", e.code, kind, delay)
+                time.sleep(delay)
+    finally:
+        record_sheets_call(fn, args, time.perf_counter() - t0)
+
+def sheets_read(fn, *args, **kwargs):
+    return sheets_call("read", fn, *args, **kwargs)
+
+def sheets_write(fn, *args, **kwargs):
+    return sheets_call("write", fn, *args, **kwargs)
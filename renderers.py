@@ -63,3 +63,22 @@ def render_lines_usd(data: dict[str, float]) -> str:
     if not items:
         return "  - (sin datos)"
     return "\n".join([f"  - {k}: ${v:,.2f}" for k, v in items])
+
+def split_message(txt: str, limit: int = 4000) -> list[str]:
+    chunks = []
+    current = ""
+    for line in txt.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
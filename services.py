@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime
 
 from config import (
@@ -8,32 +9,35 @@ from config import (
     SHEET_INGRESOS,
     SHEET_MOVIMIENTOS,
     TZ,
-    USER_SHEETS,
 )
+from debt_cache import invalidate_deudas
+from finance import DEU_COLS
 from helpers import format_money_q, to_float
-from sheets_service import get_sheet_for_user
+from quota import sheets_read, sheets_write
+from sheet_utils import (
+    append_cells_request,
+    build_header_map,
+    column_index,
+    compile_plan,
+    is_formula,
+    update_cell_request,
+)
+from sheets_async import run_sheets
+from sheets_service import get_sheet_for_user, get_worksheet, invalidate_on_error, mark_written
+from snapshot import LEDGER_RANGES
+from storage import storage_for
 from validators import validate_flow_data
+from write_queue import is_processed, mark_processed, queue_write
 
-async def save_to_sheets(context, data, uid: int):
-    gc = context.application.bot_data["gc"]
-    uid_str = str(uid)
-    sheet_id = USER_SHEETS.get(uid_str)
-    if not sheet_id:
-        raise RuntimeError("Tu usuario no tiene Sheet configurado.")
-
-    validate_flow_data(data)
-    sh = gc.open_by_key(sheet_id)
-
+def row_for_data(data) -> tuple[str, list]:
     if data["tipo"] == "ING":
-        ws = sh.worksheet(SHEET_INGRESOS)
-        ws.append_row([
+        return SHEET_INGRESOS, [
             data["fecha"], data["fuente"], data["categoria"],
             data["monto"], data["metodo"], data["banco"], data["nota"]
-        ], value_input_option="USER_ENTERED")
+        ]
 
-    elif data["tipo"] == "MOV":
-        ws = sh.worksheet(SHEET_MOVIMIENTOS)
-        ws.append_row([
+    if data["tipo"] == "MOV":
+        return SHEET_MOVIMIENTOS, [
             data["fecha"],
             data.get("bolsa_remitente", BOLSA_NORMAL),
             data.get("remitente", ""),
@@ -43,11 +47,10 @@ async def save_to_sheets(context, data, uid: int):
             data["monto"],
             data.get("monto_destino", 0),
             data.get("nota", ""),
-        ], value_input_option="USER_ENTERED")
+        ]
 
-    elif data["tipo"] == "DEUDA":
-        ws = sh.worksheet(SHEET_DEUDAS)
-        ws.append_row([
+    if data["tipo"] == "DEUDA":
+        return SHEET_DEUDAS, [
             data["deuda_nombre"],
             data["deuda_acreedor"],
             data["deuda_fecha_pago"],
@@ -57,23 +60,29 @@ async def save_to_sheets(context, data, uid: int):
             data["deuda_pendientes"],
             data["deuda_saldo"],
             data["deuda_estado"],
-        ], value_input_option="USER_ENTERED")
+        ]
 
-    else:
-        ws = sh.worksheet(SHEET_EGRESOS)
-        ws.append_row([
-            data["fecha"], data["categoria"],
-            data["monto"], data["metodo"], data["banco"], data["nota"]
-        ], value_input_option="USER_ENTERED")
+    return SHEET_EGRESOS, [
+        data["fecha"], data["categoria"],
+        data["monto"], data["metodo"], data["banco"], data["nota"]
+    ]
+
+async def save_to_sheets(context, data, uid: int):
+    gc = context.application.bot_data["gc"]
 
-def sumar_un_pago_deuda(sh, row_num: int):
-    ws = sh.worksheet(SHEET_DEUDAS)
-    pagados_actual = int(to_float(ws.cell(row_num, 6).value))
-    ws.update_cell(row_num, 6, pagados_actual + 1)
+    validate_flow_data(data)
+    tab, row = row_for_data(data)
 
-def registrar_egreso_deuda(sh, fecha: str, cuenta_pago: str, monto: float, nombre_deuda: str):
-    ws = sh.worksheet(SHEET_EGRESOS)
+    await queue_write(gc, uid, tab, row)
 
+_pagos_locks: dict[int, threading.Lock] = {}
+_pagos_guard = threading.Lock()
+
+def _pagos_lock_for(uid: int) -> threading.Lock:
+    with _pagos_guard:
+        return _pagos_locks.setdefault(int(uid), threading.Lock())
+
+def egreso_deuda_row(fecha, cuenta_pago: str, monto: float, nombre_deuda: str) -> list:
     if cuenta_pago.strip().lower() in {"bi", "banrural", "nexa", "zigi", "gyt"}:
         metodo = "Transferencia"
         banco = cuenta_pago
@@ -81,32 +90,91 @@ def registrar_egreso_deuda(sh, fecha: str, cuenta_pago: str, monto: float, nombr
         metodo = cuenta_pago
         banco = ""
 
-    ws.append_row([
+    return [
         fecha,
         "Deuda",
         monto,
         metodo,
         banco,
         f"Pago de deuda: {nombre_deuda}"
-    ], value_input_option="USER_ENTERED")
-
-async def ejecutar_pago_deuda(context, uid: int, data: dict):
-    from finance import build_deudas
+    ]
+
+def leer_fila_deuda(sh, row_num: int) -> tuple[dict, list]:
+    last = LEDGER_RANGES[SHEET_DEUDAS].split(":")[1]
+    with invalidate_on_error(sh.id):
+        res = sheets_read(
+            sh.values_batch_get,
+            [f"'{SHEET_DEUDAS}'!A1:{last}1", f"'{SHEET_DEUDAS}'!A{row_num}:{last}{row_num}"],
+            params={"valueRenderOption": "FORMULA"},
+        )
+    header, row = [(vr.get("values") or [[]])[0] for vr in res.get("valueRanges", [])]
+    return build_header_map([header]), row
+
+def cambios_pago_deuda(hmap: dict, row: list, data: dict) -> dict[int, object]:
+    plan = compile_plan(hmap, DEU_COLS)
+    valores = {f: plan[f](row) for f in DEU_COLS}
+
+    if str(valores["nombre"]).strip() != data["deuda_nombre"]:
+        raise ValueError("La deuda cambió de fila en el Sheet. Vuelve a intentarlo con /pagar.")
+    if is_formula(valores["pagados"]) or column_index(hmap, *DEU_COLS["pagados"]) is None:
+        raise ValueError("No puedo actualizar PAGADOS en esa deuda.")
+
+    pagados = int(to_float(valores["pagados"]))
+    if pagados != data["deuda_pagados"]:
+        raise ValueError("Esa deuda se actualizó mientras pagabas. Vuelve a intentarlo con /pagar.")
+
+    meses = int(to_float(valores["meses"]))
+    pendientes = meses - pagados
+    if not is_formula(valores["pendientes"]) and to_float(valores["pendientes"]) > 0:
+        pendientes = int(to_float(valores["pendientes"]))
+    estado = "" if is_formula(valores["estado"]) else str(valores["estado"] or "").strip()
+    if pendientes <= 0 or (estado and estado.lower() != "activa"):
+        raise ValueError("Esa deuda ya está pagada.")
 
-    gc = context.application.bot_data["gc"]
+    pendientes -= 1
+    nuevos = {
+        "pagados": pagados + 1,
+        "pendientes": pendientes,
+        "saldo": float(data["deuda_cuota"]) * pendientes,
+        "estado": "Activa" if pendientes > 0 else "Pagada",
+    }
+    cambios = {}
+    for field, value in nuevos.items():
+        idx = column_index(hmap, *DEU_COLS[field])
+        if idx is not None and (field == "pagados" or not is_formula(valores[field])):
+            cambios[idx] = value
+    return cambios
+
+def pagar_deuda(gc, uid: int, data: dict) -> bool:
     sh = get_sheet_for_user(gc, uid)
-
-    fecha = datetime.now(TZ).strftime("%Y-%m-%d")
+    key = f"pago:{sh.id}:{data['pago_key']}"
     row_num = data["deuda_row"]
-    nombre_deuda = data["deuda_nombre"]
-    cuota = float(data["deuda_cuota"])
-    cuenta_pago = data["cuenta_pago"]
-
-    deuda_actual = next((d for d in build_deudas(gc, uid) if d["row"] == row_num), None)
-    if not deuda_actual:
-        raise ValueError("No encontré la deuda seleccionada.")
-    if deuda_actual["estado"].lower() != "activa" or deuda_actual["pendientes"] <= 0:
-        raise ValueError("Esa deuda ya está pagada.")
 
-    sumar_un_pago_deuda(sh, row_num)
-    registrar_egreso_deuda(sh, fecha, cuenta_pago, cuota, nombre_deuda)
+    with _pagos_lock_for(uid):
+        if is_processed(key):
+            return False
+
+        try:
+            hmap, row = leer_fila_deuda(sh, row_num)
+            try:
+                cambios = cambios_pago_deuda(hmap, row, data)
+            except ValueError:
+                invalidate_deudas(sh.id)
+                raise
+
+            deudas_id = get_worksheet(sh, SHEET_DEUDAS).id
+            egresos_id = get_worksheet(sh, SHEET_EGRESOS).id
+            egreso = egreso_deuda_row(datetime.now(TZ).date(), data["cuenta_pago"], float(data["deuda_cuota"]), data["deuda_nombre"])
+            requests = [update_cell_request(deudas_id, row_num, idx, value) for idx, value in cambios.items()]
+            requests.append(append_cells_request(egresos_id, [egreso]))
+
+            with invalidate_on_error(sh.id):
+                sheets_write(sh.batch_update, {"requests": requests})
+        finally:
+            mark_written(sh.id)
+        mark_processed(key)
+    return True
+
+async def ejecutar_pago_deuda(context, uid: int, data: dict):
+    gc = context.application.bot_data["gc"]
+    return await run_sheets(uid, storage_for(uid).update_debt, gc, uid, data)
@@ -1,5 +1,9 @@
+from datetime import date
+
 from helpers import norm_key
 
+SHEETS_EPOCH = date(1899, 12, 30)
+
 def build_header_map(values: list[list[str]]) -> dict[str, int]:
     if not values:
         return {}
@@ -17,3 +21,55 @@ def cell(row: list, hmap: dict[str, int], *names: str):
 
 def row_cell(row: list, hmap: dict[str, int], *names: str):
     return cell(row, hmap, *names)
+
+def column_index(hmap: dict[str, int], *names: str):
+    for n in names:
+        k = norm_key(n)
+        if k in hmap:
+            return hmap[k]
+    return None
+
+def col_getter(hmap: dict[str, int], *names: str):
+    idx = column_index(hmap, *names)
+    if idx is None:
+        return lambda row: ""
+
+    def get(row):
+        return row[idx] if idx < len(row) else ""
+    return get
+
+def compile_plan(hmap: dict[str, int], spec: dict[str, tuple[str, ...]]) -> dict:
+    return {field: col_getter(hmap, *names) for field, names in spec.items()}
+
+def is_formula(value) -> bool:
+    return isinstance(value, str) and value.startswith("=")
+
+def user_cell(value) -> dict:
+    if isinstance(value, date):
+        return {
+            "userEnteredValue": {"numberValue": (value - SHEETS_EPOCH).days},
+            "userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "yyyy-mm-dd"}},
+        }
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": "" if value is None else str(value)}}
+
+def update_cell_request(sheet_id: int, row_num: int, col_idx: int, value) -> dict:
+    return {
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": row_num - 1, "columnIndex": col_idx},
+            "rows": [{"values": [user_cell(value)]}],
+            "fields": "userEnteredValue",
+        }
+    }
+
+def append_cells_request(sheet_id: int, rows: list[list]) -> dict:
+    return {
+        "appendCells": {
+            "sheetId": sheet_id,
+            "rows": [{"values": [user_cell(v) for v in row]} for row in rows],
+            "fields": "userEnteredValue,userEnteredFormat",
+        }
+    }
@@ -0,0 +1,44 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from telegram.ext import BaseUpdateProcessor
+
+from config import SHEETS_MAX_WORKERS, SHEETS_PER_USER_LIMIT
+
+_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+_user_limits: dict[int, asyncio.Semaphore] = {}
+
+def user_limit(uid: int) -> asyncio.Semaphore:
+    sem = _user_limits.get(int(uid))
+    if sem is None:
+        sem = asyncio.Semaphore(SHEETS_PER_USER_LIMIT)
+        _user_limits[int(uid)] = sem
+    return sem
+
+async def run_sheets(uid: int, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    async with user_limit(uid):
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, partial(ctx.run, fn, *args, **kwargs))
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = 256):
+        super().__init__(max_concurrent_updates)
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            await coroutine
+            return
+        lock = self._locks.setdefault(user.id, asyncio.Lock())
+        async with lock:
+            await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -1,16 +1,79 @@
+import time
+from contextlib import contextmanager
+
 import gspread
+from gspread.exceptions import APIError, WorksheetNotFound
 from google.oauth2.service_account import Credentials
 
-from config import SERVICE_ACCOUNT_INFO, USER_SHEETS
+from config import SERVICE_ACCOUNT_INFO, SHEET_HANDLE_TTL, USER_SHEETS
+from metrics import on_response
+from quota import sheets_read
 
-def get_sheet_for_user(gc, uid: int):
-    uid_str = str(uid)
-    sheet_id = USER_SHEETS.get(uid_str)
+_handles: dict[str, dict] = {}
+_write_versions: dict[str, int] = {}
+
+def get_sheet_id(uid: int) -> str:
+    sheet_id = USER_SHEETS.get(str(uid))
     if not sheet_id:
         raise RuntimeError("Tu usuario no tiene Sheet configurado.")
-    return gc.open_by_key(sheet_id)
+    return sheet_id
+
+def get_sheet_for_user(gc, uid: int):
+    sheet_id = get_sheet_id(uid)
+    entry = _handles.get(sheet_id)
+    if entry is None or time.monotonic() - entry["opened_at"] > SHEET_HANDLE_TTL:
+        entry = {"sh": sheets_read(gc.open_by_key, sheet_id), "ws": {}, "opened_at": time.monotonic()}
+        _handles[sheet_id] = entry
+    return entry["sh"]
+
+def get_worksheet(sh, name: str):
+    entry = _handles.get(sh.id)
+    if entry is None or entry["sh"] is not sh:
+        return sheets_read(sh.worksheet, name)
+    ws = entry["ws"].get(name)
+    if ws is None:
+        with invalidate_on_error(sh.id):
+            ws = sheets_read(sh.worksheet, name)
+        entry["ws"][name] = ws
+    return ws
+
+def find_worksheet(sh, name: str):
+    entry = _handles.get(sh.id)
+    cached = entry is not None and entry["sh"] is sh
+    if cached and name in entry["ws"]:
+        return entry["ws"][name]
+    try:
+        ws = sheets_read(sh.worksheet, name)
+    except WorksheetNotFound:
+        ws = None
+    if cached:
+        entry["ws"][name] = ws
+    return ws
+
+def mark_written(sheet_id: str):
+    _write_versions[sheet_id] = _write_versions.get(sheet_id, 0) + 1
+
+def write_version(sheet_id: str) -> int:
+    return _write_versions.get(sheet_id, 0)
+
+def invalidate_sheet(sheet_id: str):
+    _handles.pop(sheet_id, None)
+
+@contextmanager
+def invalidate_on_error(sheet_id: str):
+    try:
+        yield
+    except WorksheetNotFound:
+        invalidate_sheet(sheet_id)
+        raise
+    except APIError as e:
+        if e.code in (403, 404):
+            invalidate_sheet(sheet_id)
+        raise
 
 def gs_client():
     scopes = ["https://www.googleapis.com/auth/spreadsheets"]
     creds = Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=scopes)
-    return gspread.authorize(creds)
+    gc = gspread.authorize(creds)
+    gc.http_client.session.hooks["response"].append(on_response)
+    return gc
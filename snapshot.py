@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+
+from config import LEDGER_MIRROR, SHEET_CATEGORIAS, SHEET_DEUDAS, SHEET_EGRESOS, SHEET_INGRESOS, SHEET_MOVIMIENTOS
+from quota import sheets_read
+from sheet_utils import build_header_map
+from sheets_service import get_sheet_for_user, get_sheet_id, invalidate_on_error
+
+LEDGER_RANGES = {
+    SHEET_INGRESOS: "A1:G",
+    SHEET_EGRESOS: "A1:F",
+    SHEET_MOVIMIENTOS: "A1:I",
+    SHEET_CATEGORIAS: "A1:G",
+    SHEET_DEUDAS: "A1:I",
+}
+
+@dataclass
+class SheetTable:
+    values: list[list[str]] = field(default_factory=list)
+    hmap: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rows(self) -> list[list[str]]:
+        return self.values[1:]
+
+    def column(self, idx: int) -> list[str]:
+        return [row[idx] if idx < len(row) else "" for row in self.values]
+
+@dataclass
+class LedgerSnapshot:
+    tables: dict[str, SheetTable] = field(default_factory=dict)
+    sheet_id: str = ""
+    generations: dict[str, int] = field(default_factory=dict)
+    agregado: bool = False
+    cache: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def table(self, name: str) -> SheetTable:
+        return self.tables.get(name) or SheetTable()
+
+def make_table(values: list[list[str]]) -> SheetTable:
+    return SheetTable(values=values, hmap=build_header_map(values))
+
+def load_sheet_tables(gc, uid: int, tabs: list[str], rango=None) -> LedgerSnapshot:
+    if not tabs:
+        return LedgerSnapshot()
+
+    if LEDGER_MIRROR:
+        from mirror import load_mirrored_snapshot
+        return load_mirrored_snapshot(gc, uid, tabs, rango)
+
+    sh = get_sheet_for_user(gc, uid)
+    ranges = [f"'{t}'!{LEDGER_RANGES[t]}" for t in tabs]
+
+    with invalidate_on_error(sh.id):
+        res = sheets_read(sh.values_batch_get, ranges)
+
+    value_ranges = res.get("valueRanges", [])
+    tables = {}
+    for t, vr in zip(tabs, value_ranges):
+        tables[t] = make_table(vr.get("values", []))
+    return LedgerSnapshot(tables=tables, sheet_id=sh.id)
+
+def load_snapshot(gc, uid: int, tabs=None, rango=None, agregado: bool = False) -> LedgerSnapshot:
+    from catalogs import cached_catalog_table, store_catalog_table
+    from storage import storage_for
+    from write_queue import flush_before_read
+    flush_before_read(gc, uid)
+
+    tabs = list(tabs or LEDGER_RANGES)
+    sheet_id = get_sheet_id(uid)
+    catalogo = cached_catalog_table(sheet_id) if SHEET_CATEGORIAS in tabs else None
+    if catalogo is not None:
+        tabs.remove(SHEET_CATEGORIAS)
+
+    snap = storage_for(uid).read_tables(gc, uid, tabs, rango=rango, agregado=agregado)
+    if catalogo is not None:
+        snap.tables[SHEET_CATEGORIAS] = catalogo
+    elif SHEET_CATEGORIAS in snap.tables:
+        store_catalog_table(sheet_id, snap.tables[SHEET_CATEGORIAS])
+    return snap
@@ -0,0 +1,295 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+
+from config import (
+    BANCOS,
+    CATEG_EGR,
+    CATEG_ING,
+    CUENTAS,
+    DATA_DIR,
+    FUENTES_ING,
+    METODOS,
+    PERSONAS_PRESTAMO,
+    SHEET_CATEGORIAS,
+    SHEET_DEUDAS,
+    SHEET_EGRESOS,
+    SHEET_INGRESOS,
+    SHEET_MOVIMIENTOS,
+    SHEET_TIPO_CAMBIO,
+)
+from helpers import norm_key, parse_fecha, to_float
+from sheet_utils import build_header_map
+from snapshot import LedgerSnapshot, make_table
+
+SQLITE_PREFIX = "sqlite:"
+
+SCHEMAS = {
+    SHEET_INGRESOS: (
+        ("fecha", "FECHA"), ("fuente", "FUENTE"), ("categoria", "CATEGORÍA"), ("monto", "MONTO"),
+        ("metodo", "MÉTODO"), ("banco", "BANCO"), ("nota", "NOTA"),
+    ),
+    SHEET_EGRESOS: (
+        ("fecha", "FECHA"), ("categoria", "CATEGORÍA"), ("monto", "MONTO"),
+        ("metodo", "MÉTODO"), ("banco", "BANCO"), ("nota", "NOTA"),
+    ),
+    SHEET_MOVIMIENTOS: (
+        ("fecha", "FECHA"), ("bolsa_remitente", "BOLSA_REMITENTE"), ("remitente", "REMITENTE"),
+        ("bolsa_destino", "BOLSA_DESTINO"), ("destino", "DESTINO"), ("persona_prestamo", "PERSONA_PRESTAMO"),
+        ("monto", "MONTO"), ("monto_destino", "MONTO_DESTINO"), ("nota", "NOTA"),
+    ),
+    SHEET_DEUDAS: (
+        ("nombre", "NOMBRE"), ("acreedor", "A QUIÉN LE DEBO"), ("fecha_pago", "FECHA DE PAGO"),
+        ("cuota", "CUOTA"), ("meses", "MESES"), ("pagados", "PAGADOS"), ("pendientes", "PENDIENTES"),
+        ("saldo", "SALDO"), ("estado", "ESTADO"),
+    ),
+    SHEET_TIPO_CAMBIO: (("fecha", "FECHA"), ("tasa", "TASA")),
+}
+TABLES = {
+    SHEET_INGRESOS: "ingresos",
+    SHEET_EGRESOS: "egresos",
+    SHEET_MOVIMIENTOS: "movimientos",
+    SHEET_DEUDAS: "deudas",
+    SHEET_TIPO_CAMBIO: "tipo_cambio",
+}
+NUMERIC = {"monto", "monto_destino", "cuota", "meses", "pagados", "pendientes", "saldo", "tasa"}
+GROUP_KEYS = {
+    SHEET_INGRESOS: ("fuente", "categoria", "metodo", "banco"),
+    SHEET_EGRESOS: ("categoria", "metodo", "banco"),
+    SHEET_MOVIMIENTOS: ("bolsa_remitente", "remitente", "bolsa_destino", "destino", "persona_prestamo"),
+}
+DATED_GROUPS = {
+    SHEET_INGRESOS: "CASE WHEN norm_key(categoria) = 'inversiones' THEN fecha ELSE '' END",
+    SHEET_MOVIMIENTOS: (
+        "CASE WHEN norm_key(bolsa_remitente) = 'inversion' OR norm_key(bolsa_destino) = 'inversion' "
+        "THEN fecha ELSE '' END"
+    ),
+}
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ingresos_fecha ON ingresos (fecha_ord)",
+    "CREATE INDEX IF NOT EXISTS ingresos_categoria ON ingresos (categoria, metodo, banco, monto)",
+    "CREATE INDEX IF NOT EXISTS ingresos_cuenta ON ingresos (metodo, banco)",
+    "CREATE INDEX IF NOT EXISTS egresos_fecha ON egresos (fecha_ord)",
+    "CREATE INDEX IF NOT EXISTS egresos_categoria ON egresos (categoria, metodo, banco, monto)",
+    "CREATE INDEX IF NOT EXISTS egresos_cuenta ON egresos (metodo, banco)",
+    "CREATE INDEX IF NOT EXISTS movimientos_fecha ON movimientos (fecha_ord)",
+    "CREATE INDEX IF NOT EXISTS movimientos_origen ON movimientos (bolsa_remitente, remitente)",
+    "CREATE INDEX IF NOT EXISTS movimientos_destino ON movimientos (bolsa_destino, destino)",
+)
+
+_ready: set[str] = set()
+_ready_lock = threading.Lock()
+
+def is_sqlite_key(sheet_id: str) -> bool:
+    return sheet_id.startswith(SQLITE_PREFIX)
+
+def store_path(key: str) -> str:
+    name = re.sub(r"[^\w-]", "_", key[len(SQLITE_PREFIX):]) or "default"
+    return os.path.join(DATA_DIR, f"ledger_{name}.sqlite3")
+
+def header(tab: str) -> list[str]:
+    return [h for _, h in SCHEMAS[tab]]
+
+def columns(tab: str) -> list[str]:
+    return [c for c, _ in SCHEMAS[tab]]
+
+def default_catalog() -> list[list[str]]:
+    cols = [FUENTES_ING, CATEG_ING, METODOS, BANCOS, CATEG_EGR, CUENTAS, PERSONAS_PRESTAMO]
+    out = [["FUENTES", "CATEG_ING", "METODOS", "BANCOS", "CATEG_EGR", "CUENTAS", "PERSONAS"]]
+    for i in range(max(len(c) for c in cols)):
+        out.append([c[i] if i < len(c) else "" for c in cols])
+    return out
+
+def create_schema(conn):
+    for tab, table in TABLES.items():
+        defs = ", ".join(f"{c} REAL" if c in NUMERIC else f"{c} TEXT NOT NULL DEFAULT ''" for c in columns(tab))
+        fecha_ord = ", fecha_ord INTEGER" if tab != SHEET_DEUDAS else ""
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (fila INTEGER PRIMARY KEY, {defs}{fecha_ord})")
+    conn.execute("CREATE TABLE IF NOT EXISTS categorias (fila INTEGER PRIMARY KEY, valores TEXT NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS pagos (clave TEXT PRIMARY KEY)")
+    conn.execute("CREATE TABLE IF NOT EXISTS cola (id INTEGER PRIMARY KEY)")
+    for ddl in INDEXES:
+        conn.execute(ddl)
+    if conn.execute("SELECT COUNT(*) FROM categorias").fetchone()[0] == 0:
+        write_catalog(conn, default_catalog())
+
+def connect(key: str):
+    path = store_path(key)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.create_function("norm_key", 1, norm_key, deterministic=True)
+    if path not in _ready:
+        with _ready_lock:
+            with conn:
+                create_schema(conn)
+            _ready.add(path)
+    return conn
+
+def cell_text(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def db_value(column: str, v):
+    if column in NUMERIC:
+        return None if str(v if v is not None else "").strip() == "" else to_float(v)
+    if isinstance(v, date):
+        return v.isoformat()
+    return "" if v is None else str(v)
+
+def fecha_ordinal(v):
+    f = v if isinstance(v, date) else parse_fecha(str(v or ""))
+    return f.toordinal() if f else None
+
+def insert_rows(conn, tab: str, rows: list[list]) -> int:
+    cols = columns(tab)
+    dated = tab != SHEET_DEUDAS
+    (fila,) = conn.execute(f"SELECT COALESCE(MAX(fila), 1) FROM {TABLES[tab]}").fetchone()
+    params = []
+    for row in rows:
+        fila += 1
+        row = list(row) + [""] * (len(cols) - len(row))
+        values = [db_value(c, v) for c, v in zip(cols, row)]
+        if dated:
+            values.append(fecha_ordinal(row[0]))
+        params.append((fila, *values))
+    names = ", ".join(["fila", *cols, *(["fecha_ord"] if dated else [])])
+    marks = ", ".join("?" * (len(cols) + 1 + dated))
+    conn.executemany(f"INSERT INTO {TABLES[tab]} ({names}) VALUES ({marks})", params)
+    return len(params)
+
+def write_catalog(conn, values: list[list[str]]):
+    conn.execute("DELETE FROM categorias")
+    conn.executemany(
+        "INSERT INTO categorias (fila, valores) VALUES (?, ?)",
+        [(i, json.dumps(row, ensure_ascii=False)) for i, row in enumerate(values, start=1)],
+    )
+
+def read_catalog(conn) -> list[list[str]]:
+    return [json.loads(v) for (v,) in conn.execute("SELECT valores FROM categorias ORDER BY fila")]
+
+def read_tab(conn, tab: str, rango=None) -> list[list[str]]:
+    sql = f"SELECT {', '.join(columns(tab))} FROM {TABLES[tab]}"
+    params = ()
+    if rango and tab != SHEET_DEUDAS:
+        sql += " WHERE fecha_ord >= ? AND fecha_ord < ?"
+        params = (rango[0].toordinal(), rango[1].toordinal())
+    rows = conn.execute(sql + " ORDER BY fila", params)
+    return [header(tab)] + [[cell_text(v) for v in r] for r in rows]
+
+def read_grouped(conn, tab: str) -> list[list[str]]:
+    keys = list(GROUP_KEYS[tab])
+    exprs = list(keys)
+    if tab in DATED_GROUPS:
+        keys.append("fecha")
+        exprs.append(DATED_GROUPS[tab])
+    sums = [c for c in columns(tab) if c in NUMERIC]
+    group = exprs + (["monto_destino <> 0"] if "monto_destino" in sums else [])
+    sql = (
+        f"SELECT {', '.join(exprs)}, {', '.join(f'TOTAL({c})' for c in sums)} "
+        f"FROM {TABLES[tab]} GROUP BY {', '.join(group)} ORDER BY MIN(fila)"
+    )
+    out = [header(tab)]
+    for r in conn.execute(sql):
+        values = dict(zip(keys, r))
+        values.update(zip(sums, r[len(keys):]))
+        out.append([cell_text(values.get(c, "")) for c in columns(tab)])
+    return out
+
+def read_tables(key: str, tabs: list[str], rango=None, agregado: bool = False) -> LedgerSnapshot:
+    conn = connect(key)
+    try:
+        tables = {}
+        for t in tabs:
+            if t == SHEET_CATEGORIAS:
+                values = read_catalog(conn)
+            elif agregado and t in GROUP_KEYS:
+                values = read_grouped(conn, t)
+            else:
+                values = read_tab(conn, t, rango)
+            tables[t] = make_table(values)
+    finally:
+        conn.close()
+    return LedgerSnapshot(tables=tables, sheet_id=key, agregado=agregado)
+
+def append_rows(key: str, tab: str, rows: list[list], ids: list[int] = ()) -> int:
+    conn = connect(key)
+    try:
+        with conn:
+            conn.executemany("INSERT INTO cola (id) VALUES (?)", [(id_,) for id_ in ids])
+            return insert_rows(conn, tab, rows)
+    finally:
+        conn.close()
+
+def appended_ids(key: str, ids: list[int]) -> set[int]:
+    conn = connect(key)
+    try:
+        marks = ",".join("?" * len(ids))
+        return {id_ for (id_,) in conn.execute(f"SELECT id FROM cola WHERE id IN ({marks})", list(ids))}
+    finally:
+        conn.close()
+
+def read_catalog_values(key: str) -> list[list[str]]:
+    conn = connect(key)
+    try:
+        return read_catalog(conn)
+    finally:
+        conn.close()
+
+def pay_debt(key: str, data: dict, egreso: list) -> bool:
+    from services import cambios_pago_deuda
+
+    row_num = data["deuda_row"]
+    cols = columns(SHEET_DEUDAS)
+    conn = connect(key)
+    try:
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM pagos WHERE clave = ?", (data["pago_key"],)).fetchone():
+                conn.execute("ROLLBACK")
+                return False
+            hit = conn.execute(f"SELECT {', '.join(cols)} FROM deudas WHERE fila = ?", (row_num,)).fetchone()
+            row = [cell_text(v) for v in hit] if hit else []
+            cambios = cambios_pago_deuda(build_header_map([header(SHEET_DEUDAS)]), row, data)
+            sets = {cols[idx]: db_value(cols[idx], v) for idx, v in cambios.items()}
+            conn.execute(
+                f"UPDATE deudas SET {', '.join(f'{c} = ?' for c in sets)} WHERE fila = ?",
+                (*sets.values(), row_num),
+            )
+            insert_rows(conn, SHEET_EGRESOS, [egreso])
+            conn.execute("INSERT INTO pagos (clave) VALUES (?)", (data["pago_key"],))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def import_tables(key: str, tables: dict[str, list[list]]) -> dict[str, int]:
+    conn = connect(key)
+    try:
+        counts = {}
+        with conn:
+            for tab, values in tables.items():
+                if tab == SHEET_CATEGORIAS:
+                    write_catalog(conn, values)
+                    counts[tab] = max(len(values) - 1, 0)
+                    continue
+                if tab not in TABLES or not values:
+                    continue
+                hmap = build_header_map(values)
+                pos = [hmap.get(norm_key(h)) for h in header(tab)]
+                rows = [[r[i] if i is not None and i < len(r) else "" for i in pos] for r in values[1:]]
+                conn.execute(f"DELETE FROM {TABLES[tab]}")
+                counts[tab] = insert_rows(conn, tab, rows)
+        return counts
+    finally:
+        conn.close()
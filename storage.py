@@ -0,0 +1,111 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from config import SHEET_TIPO_CAMBIO, TZ
+from sheets_service import get_sheet_id, mark_written
+import sqlite_store
+
+class Storage(ABC):
+    remote = True
+
+    @abstractmethod
+    def read_tables(self, gc, uid: int, tabs: list[str], rango=None, agregado: bool = False):
+        ...
+
+    @abstractmethod
+    def append_rows(self, gc, uid: int, tab: str, rows: list[list], ids: list[int]):
+        ...
+
+    @abstractmethod
+    def landed_ids(self, gc, uid: int, tab: str, ids: list[int]) -> set[int]:
+        ...
+
+    @abstractmethod
+    def update_debt(self, gc, uid: int, data: dict) -> bool:
+        ...
+
+    @abstractmethod
+    def read_catalog(self, gc, uid: int, force: bool = False) -> dict:
+        ...
+
+    @abstractmethod
+    def read_rates(self, gc, uid: int) -> list[list[str]]:
+        ...
+
+class SheetsStorage(Storage):
+    def read_tables(self, gc, uid: int, tabs: list[str], rango=None, agregado: bool = False):
+        from snapshot import load_sheet_tables
+        return load_sheet_tables(gc, uid, tabs, rango)
+
+    def append_rows(self, gc, uid: int, tab: str, rows: list[list], ids: list[int]):
+        from write_queue import append_pending
+        append_pending(gc, uid, tab, rows, ids)
+
+    def landed_ids(self, gc, uid: int, tab: str, ids: list[int]) -> set[int]:
+        from write_queue import appended_ids
+        return appended_ids(gc, uid, tab, ids)
+
+    def update_debt(self, gc, uid: int, data: dict) -> bool:
+        from services import pagar_deuda
+        return pagar_deuda(gc, uid, data)
+
+    def read_catalog(self, gc, uid: int, force: bool = False) -> dict:
+        from catalogs import load_catalogos
+        from sheets_service import get_sheet_for_user
+        return load_catalogos(get_sheet_for_user(gc, uid), force=force)
+
+    def read_rates(self, gc, uid: int) -> list[list[str]]:
+        from fx import FX_RANGE
+        from quota import sheets_read
+        from sheets_service import find_worksheet, get_sheet_for_user
+
+        ws = find_worksheet(get_sheet_for_user(gc, uid), SHEET_TIPO_CAMBIO)
+        if ws is None:
+            return []
+        return [list(r) for r in sheets_read(ws.get, FX_RANGE)]
+
+class SQLiteStorage(Storage):
+    remote = False
+
+    def read_tables(self, gc, uid: int, tabs: list[str], rango=None, agregado: bool = False):
+        return sqlite_store.read_tables(get_sheet_id(uid), tabs, rango, agregado)
+
+    def append_rows(self, gc, uid: int, tab: str, rows: list[list], ids: list[int]):
+        key = get_sheet_id(uid)
+        try:
+            sqlite_store.append_rows(key, tab, rows, ids)
+        finally:
+            mark_written(key)
+
+    def landed_ids(self, gc, uid: int, tab: str, ids: list[int]) -> set[int]:
+        return sqlite_store.appended_ids(get_sheet_id(uid), ids)
+
+    def update_debt(self, gc, uid: int, data: dict) -> bool:
+        from services import egreso_deuda_row
+
+        key = get_sheet_id(uid)
+        egreso = egreso_deuda_row(datetime.now(TZ).date(), data["cuenta_pago"], float(data["deuda_cuota"]), data["deuda_nombre"])
+        try:
+            return sqlite_store.pay_debt(key, data, egreso)
+        finally:
+            mark_written(key)
+
+    def read_catalog(self, gc, uid: int, force: bool = False) -> dict:
+        from catalogs import cached_catalogos, store_catalog_table
+        from snapshot import make_table
+
+        key = get_sheet_id(uid)
+        cats = None if force else cached_catalogos(key)
+        if cats is not None:
+            return cats
+        table = make_table(sqlite_store.read_catalog_values(key))
+        return store_catalog_table(key, table, persist=False)["catalogos"]
+
+    def read_rates(self, gc, uid: int) -> list[list[str]]:
+        return sqlite_store.read_tables(get_sheet_id(uid), [SHEET_TIPO_CAMBIO]).table(SHEET_TIPO_CAMBIO).values
+
+_sheets = SheetsStorage()
+_sqlite = SQLiteStorage()
+
+def storage_for(uid: int) -> Storage:
+    return _sqlite if sqlite_store.is_sqlite_key(get_sheet_id(uid)) else _sheets
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from gspread.exceptions import APIError
+
+from config import DATA_DIR, PROCESSED_KEY_TTL, USER_SHEETS, WRITE_BATCH_SIZE, WRITE_MAX_ATTEMPTS
+from fanout import TRANSIENT_API_CODES, send_text
+from quota import mark_background
+from sheets_async import run_sheets
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "journal.sqlite3")
+QUEUE_TAG = "cola:"
+
+_locks: dict[int, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(uid: int) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(int(uid), threading.Lock())
+
+def connect():
+    os.makedirs(os.path.dirname(JOURNAL_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(JOURNAL_PATH)
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS pending_writes ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, uid INTEGER NOT NULL, tab TEXT NOT NULL,"
+        " valores TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(pending_writes)")}
+    if "attempts" not in cols:
+        conn.execute("ALTER TABLE pending_writes ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    if "sent" not in cols:
+        conn.execute("ALTER TABLE pending_writes ADD COLUMN sent INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS dead_writes ("
+        " id INTEGER PRIMARY KEY, uid INTEGER NOT NULL, tab TEXT NOT NULL, valores TEXT NOT NULL,"
+        " created_at REAL NOT NULL, failed_at REAL NOT NULL, error TEXT NOT NULL,"
+        " notified INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS processed_keys ("
+        " key TEXT PRIMARY KEY, created_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS processed_keys_created ON processed_keys (created_at)")
+    return conn
+
+def enqueue_write(uid: int, tab: str, row: list) -> int:
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO pending_writes (uid, tab, valores, created_at) VALUES (?, ?, ?, ?)",
+                (int(uid), tab, json.dumps(row, ensure_ascii=False), time.time()),
+            )
+        (n,) = conn.execute(
+            "SELECT COUNT(*) FROM pending_writes WHERE uid = ? AND tab = ?", (int(uid), tab)
+        ).fetchone()
+        return n
+    finally:
+        conn.close()
+
+def is_processed(key: str) -> bool:
+    conn = connect()
+    try:
+        return conn.execute("SELECT 1 FROM processed_keys WHERE key = ?", (key,)).fetchone() is not None
+    finally:
+        conn.close()
+
+def mark_processed(key: str):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO processed_keys (key, created_at) VALUES (?, ?)", (key, time.time()))
+    finally:
+        conn.close()
+
+def prune_processed() -> int:
+    conn = connect()
+    try:
+        with conn:
+            cur = conn.execute("DELETE FROM processed_keys WHERE created_at < ?", (time.time() - PROCESSED_KEY_TTL,))
+        return cur.rowcount
+    finally:
+        conn.close()
+
+def pending_users() -> list[int]:
+    conn = connect()
+    try:
+        return [uid for (uid,) in conn.execute("SELECT DISTINCT uid FROM pending_writes ORDER BY uid")]
+    finally:
+        conn.close()
+
+def pending_for(conn, uid: int) -> dict[str, list[tuple[int, list]]]:
+    grouped = {}
+    cur = conn.execute("SELECT id, tab, valores FROM pending_writes WHERE uid = ? ORDER BY id", (int(uid),))
+    for id_, tab, valores in cur:
+        grouped.setdefault(tab, []).append((id_, json.loads(valores)))
+    return grouped
+
+def tag_column(tab: str) -> int:
+    from snapshot import LEDGER_RANGES
+    return ord(LEDGER_RANGES[tab].rsplit(":", 1)[1][0]) - ord("A") + 2
+
+def untagged(response, width: int):
+    updates = (response or {}).get("updates") if isinstance(response, dict) else None
+    data = (updates or {}).get("updatedData") or {}
+    if not data.get("values"):
+        return response
+    values = [r[:width] for r in data["values"]]
+    return {**response, "updates": {**updates, "updatedData": {**data, "values": values}}}
+
+def append_pending(gc, uid: int, tab: str, rows: list[list], ids: list[int]):
+    from balances import apply_append
+    from mirror import record_append
+    from quota import sheets_write
+    from sheets_service import get_sheet_for_user, get_worksheet, invalidate_on_error, mark_written
+
+    width = tag_column(tab) - 1
+    tagged = [list(row) + [""] * (width - len(row)) + [f"{QUEUE_TAG}{id_}"] for row, id_ in zip(rows, ids)]
+    sh = get_sheet_for_user(gc, uid)
+    try:
+        with invalidate_on_error(sh.id):
+            res = sheets_write(
+                get_worksheet(sh, tab).append_rows,
+                tagged,
+                value_input_option="USER_ENTERED",
+                include_values_in_response=True,
+            )
+    finally:
+        mark_written(sh.id)
+    res = untagged(res, width)
+    record_append(sh.id, tab, res)
+    apply_append(sh.id, tab, res)
+
+def appended_ids(gc, uid: int, tab: str, ids: list[int]) -> set[int]:
+    from quota import sheets_read
+    from sheets_service import get_sheet_for_user, get_worksheet
+
+    ws = get_worksheet(get_sheet_for_user(gc, uid), tab)
+    tags = sheets_read(ws.col_values, tag_column(tab))
+    wanted = {f"{QUEUE_TAG}{id_}": id_ for id_ in ids}
+    return {wanted[t] for t in tags if t in wanted}
+
+def is_rejected(e: Exception) -> bool:
+    return isinstance(e, APIError) and 400 <= e.code < 500 and e.code not in TRANSIENT_API_CODES
+
+def mark_sent(conn, ids: list[int], sent: bool = True):
+    with conn:
+        conn.executemany("UPDATE pending_writes SET sent = ? WHERE id = ?", [(int(sent), id_) for id_ in ids])
+
+def send_rows(conn, storage, gc, uid: int, tab: str, items: list[tuple[int, list]]):
+    ids = [id_ for id_, _ in items]
+    mark_sent(conn, ids)
+    storage.append_rows(gc, uid, tab, [row for _, row in items], ids)
+    with conn:
+        conn.executemany("DELETE FROM pending_writes WHERE id = ?", [(id_,) for id_ in ids])
+
+def drop_landed(conn, storage, gc, uid: int, tab: str, items: list[tuple[int, list]]) -> list[tuple[int, list]]:
+    sent = [id_ for (id_,) in conn.execute(
+        "SELECT id FROM pending_writes WHERE uid = ? AND tab = ? AND sent = 1", (int(uid), tab)
+    )]
+    if not sent:
+        return items
+    landed = storage.landed_ids(gc, uid, tab, sent)
+    with conn:
+        conn.executemany("DELETE FROM pending_writes WHERE id = ?", [(id_,) for id_ in landed])
+    mark_sent(conn, [id_ for id_ in sent if id_ not in landed], False)
+    if landed:
+        logger.info("Cola de escritura: %d filas de uid=%s ya estaban en %s", len(landed), uid, tab)
+    return [(id_, row) for id_, row in items if id_ not in landed]
+
+def record_failure(conn, id_: int, error: Exception) -> bool:
+    with conn:
+        conn.execute("UPDATE pending_writes SET attempts = attempts + 1 WHERE id = ?", (id_,))
+        (attempts,) = conn.execute("SELECT attempts FROM pending_writes WHERE id = ?", (id_,)).fetchone()
+        if attempts < WRITE_MAX_ATTEMPTS:
+            return False
+        conn.execute(
+            "INSERT INTO dead_writes (id, uid, tab, valores, created_at, failed_at, error)"
+            " SELECT id, uid, tab, valores, created_at, ?, ? FROM pending_writes WHERE id = ?",
+            (time.time(), f"{type(error).__name__}: {error}", id_),
+        )
+        conn.execute("DELETE FROM pending_writes WHERE id = ?", (id_,))
+    logger.error("Fila %s de la cola apartada tras %d intentos: %s", id_, attempts, error)
+    return True
+
+def flush_rows(conn, storage, gc, uid: int, tab: str, items: list[tuple[int, list]]) -> int:
+    written = 0
+    for id_, row in items:
+        try:
+            send_rows(conn, storage, gc, uid, tab, [(id_, row)])
+        except Exception as e:
+            if not is_rejected(e):
+                raise
+            mark_sent(conn, [id_], False)
+            if record_failure(conn, id_, e):
+                continue
+            raise
+        written += 1
+    return written
+
+def flush_user(gc, uid: int) -> int:
+    from storage import storage_for
+
+    storage = storage_for(uid)
+    with _lock_for(uid):
+        conn = connect()
+        try:
+            written = 0
+            for tab, items in pending_for(conn, uid).items():
+                pending = len(items)
+                items = drop_landed(conn, storage, gc, uid, tab, items)
+                written += pending - len(items)
+                if not items:
+                    continue
+                try:
+                    send_rows(conn, storage, gc, uid, tab, items)
+                except Exception as e:
+                    if not is_rejected(e):
+                        raise
+                    mark_sent(conn, [id_ for id_, _ in items], False)
+                    written += flush_rows(conn, storage, gc, uid, tab, items)
+                    continue
+                written += len(items)
+            return written
+        finally:
+            conn.close()
+
+def unnotified_dead_writes() -> list[tuple[int, int, str, list]]:
+    conn = connect()
+    try:
+        cur = conn.execute("SELECT id, uid, tab, valores FROM dead_writes WHERE notified = 0 ORDER BY id")
+        return [(id_, uid, tab, json.loads(valores)) for id_, uid, tab, valores in cur]
+    finally:
+        conn.close()
+
+def mark_notified(ids: list[int]):
+    conn = connect()
+    try:
+        with conn:
+            conn.executemany("UPDATE dead_writes SET notified = 1 WHERE id = ?", [(id_,) for id_ in ids])
+    finally:
+        conn.close()
+
+async def notify_dead_writes(bot):
+    por_usuario = {}
+    for id_, uid, tab, row in await asyncio.to_thread(unnotified_dead_writes):
+        por_usuario.setdefault(uid, []).append((id_, tab, row))
+    for uid, filas in por_usuario.items():
+        lineas = [f"• {tab}: {' | '.join(str(v) for v in row)}" for _, tab, row in filas]
+        txt = (
+            "⚠️ Google Sheets rechazó estos registros varias veces y no se guardaron:\n"
+            + "\n".join(lineas)
+            + "\nRevisa los datos y vuelve a registrarlos."
+        )
+        try:
+            await send_text(bot, uid, txt)
+        except Exception:
+            logger.warning("No pude avisar a uid=%s de filas apartadas", uid, exc_info=True)
+            continue
+        await asyncio.to_thread(mark_notified, [id_ for id_, _, _ in filas])
+
+def flush_before_read(gc, uid: int):
+    try:
+        flush_user(gc, uid)
+    except Exception:
+        logger.warning("No pude vaciar la cola de escritura de uid=%s antes de leer", uid, exc_info=True)
+
+async def queue_write(gc, uid: int, tab: str, row: list):
+    pending = await asyncio.to_thread(enqueue_write, uid, tab, row)
+    if pending >= WRITE_BATCH_SIZE:
+        try:
+            await run_sheets(uid, flush_user, gc, uid)
+        except Exception:
+            logger.warning("No pude vaciar la cola de escritura de uid=%s", uid, exc_info=True)
+
+async def flush_all(gc):
+    for uid in await asyncio.to_thread(pending_users):
+        if str(uid) not in USER_SHEETS:
+            logger.warning("Escrituras pendientes de uid=%s sin Sheet configurado", uid)
+            continue
+        try:
+            written = await run_sheets(uid, flush_user, gc, uid)
+            if written:
+                logger.info("Cola de escritura: %d filas guardadas para uid=%s", written, uid)
+        except Exception:
+            logger.warning("No pude vaciar la cola de escritura de uid=%s", uid, exc_info=True)
+
+async def job_flush_writes(context):
+    mark_background()
+    await flush_all(context.application.bot_data["gc"])
+    await notify_dead_writes(context.bot)
+    await asyncio.to_thread(prune_processed)